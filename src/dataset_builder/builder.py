@@ -7,12 +7,36 @@ from .types import ProcessedDataRecord # Assuming this will be the input type
 # Add other necessary imports for data loading, file handling etc.
 import os
 import json
+import asyncio
 import logging
+import tempfile
 from typing import Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
 from ..storage_manager.storage import StorageManager, ACTION_DATA_FILENAME # Assuming ACTION_DATA_FILENAME is what we look for
 
+# pyarrow is optional: when installed, Parquet inputs are read in columnar record batches
+PYARROW_AVAILABLE = False
+try:
+    import pyarrow.dataset as pa_dataset
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa_dataset = None # type: ignore
+
 logger = logging.getLogger(__name__)
 
+# Rows per record batch when reading Parquet input (sized to stay cache-friendly)
+DEFAULT_READ_BATCH_SIZE = 8192
+_RECORDS_ADAPTER = TypeAdapter(list[ProcessedDataRecord])
+
+# Output files written by a build, with the content type used when uploading them to S3
+_OUTPUT_CONTENT_TYPES = {
+    "train.jsonl": "application/x-ndjson",
+    "validation.jsonl": "application/x-ndjson",
+    "dataset_stats.json": "application/json",
+}
+# Maximum number of concurrent S3 uploads when the output path is an s3:// URI
+S3_UPLOAD_CONCURRENCY = 16
+
 class DatasetBuilder:
     """Main class for building datasets in JSONL format."""
     def __init__(self, config: Optional[dict] = None, storage_manager: Optional[StorageManager] = None):
@@ -127,9 +151,30 @@ class DatasetBuilder:
                     logger.error(f"Error reading or processing file {file_path}: {e_file}")
         return all_records
 
-    async def _load_processed_data(self, input_path: str) -> list[ProcessedDataRecord]: # Made async
+    def _load_processed_data_from_parquet(self, input_path: str, batch_size: int) -> list[ProcessedDataRecord]:
+        """Loads ProcessedDataRecord objects from a Parquet file/dataset (local or s3://) in record batches."""
+        all_records: list[ProcessedDataRecord] = []
+        logger.info(f"Loading processed data from Parquet dataset: {input_path} (batch size {batch_size})")
+        dataset = pa_dataset.dataset(input_path, format="parquet")
+        for batch in dataset.to_batches(batch_size=batch_size):
+            rows = batch.to_pylist()
+            try:
+                # Validate the whole batch in one pass through pydantic-core
+                all_records.extend(_RECORDS_ADAPTER.validate_python(rows))
+            except ValidationError:
+                # Fall back to row-by-row validation so one bad row doesn't drop the batch
+                for i, raw_data in enumerate(rows):
+                    try:
+                        all_records.append(ProcessedDataRecord(**raw_data))
+                    except Exception as e_record:
+                        logger.warning(f"Could not parse Parquet row #{i} of batch in {input_path}: {e_record}")
+        return all_records
+
+    async def _load_processed_data(self, input_path: str, batch_size: int = DEFAULT_READ_BATCH_SIZE) -> list[ProcessedDataRecord]: # Made async
         """
         Loads processed data records from the given input path.
+        If input_path points to Parquet data (*.parquet) and pyarrow is installed, it is
+        read in record batches of `batch_size` rows.
         If input_path is an S3 URI (s3://bucket/prefix), it lists session/step 
         structures and attempts to load a manifest file (ACTION_DATA_FILENAME) 
         from each step, assuming it contains ProcessedDataRecord data.
@@ -137,7 +182,12 @@ class DatasetBuilder:
         """
         all_records: list[ProcessedDataRecord] = []
         
-        if input_path.startswith("s3://"):
+        if input_path.rstrip("/").endswith(".parquet"):
+            if PYARROW_AVAILABLE:
+                all_records = self._load_processed_data_from_parquet(input_path, batch_size)
+            else:
+                logger.warning(f"Input path {input_path} is Parquet data, but pyarrow is not installed. Install with `pip install pyarrow`.")
+        elif input_path.startswith("s3://"):
             _bucket, s3_prefix = self._parse_s3_uri(input_path)
             # We assume storage_manager is configured for the correct bucket.
             # The parsed _bucket from URI is mostly for validation/info here.
@@ -160,7 +210,8 @@ class DatasetBuilder:
         include_images: bool = False, 
         train_split: float = 0.9,
         # Add other relevant kwargs based on subtask details like filtering options
-        filter_options: Optional[dict] = None
+        filter_options: Optional[dict] = None,
+        read_batch_size: int = DEFAULT_READ_BATCH_SIZE
     ):
         """Builds the dataset from input_path and saves to output_path."""
         logger.info(
@@ -169,13 +220,72 @@ class DatasetBuilder:
         )
         
         # 1. Load data (now async)
-        processed_records = await self._load_processed_data(input_path)
+        processed_records = await self._load_processed_data(input_path, batch_size=read_batch_size)
 
         if not processed_records:
             logger.warning(f"No records loaded from {input_path}. Output dataset will be empty.")
             # Optionally create empty output files or handle as an error
             # For now, just log and proceed to create potentially empty files.
 
+        if output_path.startswith("s3://"):
+            await self._build_to_s3(processed_records, output_path, include_images, train_split, filter_options)
+        else:
+            self._build_from_records(processed_records, output_path, include_images, train_split, filter_options)
+
+    async def _build_to_s3(
+        self,
+        processed_records: list[ProcessedDataRecord],
+        output_uri: str,
+        include_images: bool = False,
+        train_split: float = 0.9,
+        filter_options: Optional[dict] = None
+    ):
+        """
+        Builds the dataset into a temporary directory, then uploads every output file
+        to the S3 prefix concurrently. Upload failures are logged, not raised.
+        """
+        if not self.storage_manager.use_s3:
+            logger.error(f"Output path {output_uri} is an S3 URI but StorageManager is not configured for S3. Nothing written.")
+            return
+        bucket, prefix = self._parse_s3_uri(output_uri)
+        if bucket != self.storage_manager.s3_bucket_name:
+            logger.error(
+                f"Output bucket '{bucket}' does not match StorageManager bucket "
+                f"'{self.storage_manager.s3_bucket_name}'. Nothing written."
+            )
+            return
+
+        with tempfile.TemporaryDirectory(prefix="dataset_build_") as local_dir:
+            self._build_from_records(processed_records, local_dir, include_images, train_split, filter_options)
+            uploads = []
+            for filename, content_type in _OUTPUT_CONTENT_TYPES.items():
+                local_file = os.path.join(local_dir, filename)
+                if os.path.exists(local_file):
+                    with open(local_file, 'rb') as f:
+                        uploads.append((f"{prefix}/{filename}".strip("/"), f.read(), content_type))
+
+        semaphore = asyncio.Semaphore(S3_UPLOAD_CONCURRENCY)
+
+        async def _upload(s3_key: str, body: bytes, content_type: str) -> str:
+            async with semaphore:
+                return await self.storage_manager._upload_to_s3(body, s3_key, content_type=content_type)
+
+        results = await asyncio.gather(*(_upload(*upload) for upload in uploads), return_exceptions=True)
+        for (s3_key, _, _), result in zip(uploads, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to upload dataset file to s3://{bucket}/{s3_key}: {result}")
+            else:
+                logger.info(f"Dataset file uploaded to {result}")
+
+    def _build_from_records(
+        self,
+        processed_records: list[ProcessedDataRecord],
+        output_path: str,
+        include_images: bool = False,
+        train_split: float = 0.9,
+        filter_options: Optional[dict] = None
+    ):
+        """Filters, splits, writes and summarizes already-loaded records (every build step after loading)."""
         # 2. Filter data
         if filter_options:
             self.filter.update_config(filter_options) # Allow dynamic filter updates
@@ -218,11 +328,3 @@ class DatasetBuilder:
             logger.info("Skipping statistics generation as there are no filtered records.")
 
         logger.info("Dataset build completed.")
-        
-    # Placeholder for actual data loading logic
-    def _load_processed_data(self, input_path: str) -> list[ProcessedDataRecord]:
-        # This method needs to be implemented to load ProcessedDataRecord objects
-        # from the location specified by input_path (e.g., S3 or local file system).
-        # It would iterate through checkpoint files, parse them, and create ProcessedDataRecord instances.
-        logger.warning(f"Data loading from {input_path} is not implemented yet. Returning empty list.")
-        return [] 
\ No newline at end of file
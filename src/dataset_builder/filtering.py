@@ -1,23 +1,199 @@
 '''
 Module for filtering ProcessedDataRecord objects based on specified criteria.
 '''
-from typing import List, Callable, Any, Dict, Optional, Union, Pattern
+from typing import List, Callable, Any, Dict, FrozenSet, Optional, Union, Pattern, Tuple
 import re
+import logging
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
 
+import numpy as np
+
 from .types import ProcessedDataRecord
 from .exceptions import FilteringError
 
+logger = logging.getLogger(__name__)
+
 # Type alias for a filter function that takes a record and returns True if it should be kept.
 FilterCallable = Callable[[ProcessedDataRecord], bool]
 
+# --- Column extractors and mask builders for the built-in filters ---
+# Each built-in filter kind reads one column of the records (extracted once per filter_records call,
+# however many filters of that kind are registered) and turns it into a boolean keep-mask.
+
+def _extract_domains(records: List[ProcessedDataRecord]) -> np.ndarray:
+    '''Lower-cased URL hostnames (no port or credentials); None where the URL could not be parsed.'''
+    domains = np.empty(len(records), dtype=object)
+    for i, record in enumerate(records):
+        try:
+            domains[i] = urlparse(record.url_str).hostname
+        except Exception:
+            domains[i] = None # Error parsing URL, the record is excluded by every domain filter
+    return domains
+
+def _extract_action_types(records: List[ProcessedDataRecord]) -> np.ndarray:
+    return np.array([record.action.type.lower() for record in records], dtype=str)
+
+class _HtmlRegexBank:
+    '''
+    Collects the HTML content patterns registered on one filter and reports, per record,
+    which of them match. The matcher is built lazily on the first scan:
+    - A single `re` alternation of all patterns with one named group each, scanned once
+      per record (see _scan_combined).
+    - Otherwise (e.g. a pattern with its own named groups or backreferences), each
+      pattern is searched separately with `re`.
+    '''
+    # re flags that can be scoped to one branch of the combined alternation, as "(?ims:...)"
+    _SCOPED_RE_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s"}
+    # Backreferences (\1, (?P=name)) would point at the wrong group once patterns are combined
+    _BACKREFERENCE_RE = re.compile(r"\\[1-9]|\(\?P=")
+
+    def __init__(self):
+        self.patterns: List[Pattern] = []
+        self._reset_matchers()
+
+    def _reset_matchers(self):
+        self._combined: Optional[Pattern] = None
+        self._prepared = False
+
+    def add(self, pattern: Pattern) -> int:
+        '''Registers a compiled pattern and returns its column index in scan()'s result.'''
+        self.patterns.append(pattern)
+        self._reset_matchers() # Rebuild on next scan
+        return len(self.patterns) - 1
+
+    def _compile_combined(self) -> Optional[Pattern]:
+        '''Builds "(?P<f0>p0)|(?P<f1>p1)|..." or returns None if the patterns cannot be combined.'''
+        if len(self.patterns) < 2:
+            return None # Nothing to combine
+        branches = []
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not isinstance(pattern.pattern, str) or pattern.groupindex or self._BACKREFERENCE_RE.search(pattern.pattern):
+                return None
+            remaining = pattern.flags & ~re.UNICODE
+            scoped = "".join(letter for flag, letter in self._SCOPED_RE_FLAGS.items() if remaining & flag)
+            if remaining & ~(re.IGNORECASE | re.MULTILINE | re.DOTALL):
+                return None # e.g. re.VERBOSE or re.ASCII cannot be scoped to one branch
+            body = f"(?{scoped}:{pattern.pattern})" if scoped else pattern.pattern
+            branches.append(f"(?P<f{pattern_id}>{body})")
+        try:
+            return re.compile("|".join(branches))
+        except re.error:
+            return None # e.g. a pattern with inline global flags like "(?i)..."
+
+    def _scan_combined(self, html: str, row: np.ndarray) -> None:
+        # finditer reports one branch per match, so a pattern whose matches all overlap an
+        # earlier branch's match can go unreported. If nothing matched at all, no pattern
+        # matches anywhere; otherwise the patterns not seen are confirmed with their own search.
+        for match in self._combined.finditer(html):
+            row[int(match.lastgroup[1:])] = True
+            if row.all():
+                return
+        if row.any():
+            for pattern_id in np.flatnonzero(~row):
+                row[pattern_id] = self.patterns[pattern_id].search(html) is not None
+
+    def scan(self, records: List[ProcessedDataRecord]) -> np.ndarray:
+        '''Returns a (records x patterns) boolean matrix; rows for records without HTML are all False.'''
+        if not self._prepared:
+            self._combined = self._compile_combined()
+            self._prepared = True
+
+        matches = np.zeros((len(records), len(self.patterns)), dtype=bool)
+        for i, record in enumerate(records):
+            html = record.html_content
+            if html is None:
+                continue
+            row = matches[i]
+            if self._combined is not None:
+                self._scan_combined(html, row)
+            else:
+                for pattern_id, pattern in enumerate(self.patterns):
+                    row[pattern_id] = pattern.search(html) is not None
+        return matches
+
+def _domain_suffixes(domain: str) -> List[str]:
+    '''The domain and each parent domain: "a.b.com" -> ["a.b.com", "b.com", "com"].'''
+    labels = domain.split('.')
+    return ['.'.join(labels[i:]) for i in range(len(labels))]
+
+def _domain_passes(domain: Optional[str], keep: FrozenSet[str], exclude: FrozenSet[str]) -> bool:
+    if domain is None:
+        return False
+    suffixes = _domain_suffixes(domain)
+    if exclude and not exclude.isdisjoint(suffixes):
+        return False # Domain or one of its parents is excluded; exclusion wins over keep
+    if keep and keep.isdisjoint(suffixes):
+        return False # Neither the domain nor any parent is in the keep list
+    return True
+
+def _url_domain_mask(domains: np.ndarray, keep: FrozenSet[str], exclude: FrozenSet[str]) -> np.ndarray:
+    # Datasets repeat the same few hosts many times, so each distinct domain is matched only once.
+    verdicts: Dict[Optional[str], bool] = {}
+    def passes(domain: Optional[str]) -> bool:
+        verdict = verdicts.get(domain)
+        if verdict is None:
+            verdict = verdicts[domain] = _domain_passes(domain, keep, exclude)
+        return verdict
+    return np.fromiter((passes(domain) for domain in domains), dtype=bool, count=len(domains))
+
+def _action_type_mask(action_types: np.ndarray, keep: Tuple[str, ...], exclude: Tuple[str, ...]) -> np.ndarray:
+    mask = np.ones(len(action_types), dtype=bool)
+    if keep:
+        mask &= np.isin(action_types, keep)
+    if exclude:
+        mask &= ~np.isin(action_types, exclude)
+    return mask
+
+def _html_regex_mask(html_matches: np.ndarray, pattern_id: int, present: bool) -> np.ndarray:
+    # Missing HTML counts as "pattern not found"
+    found = html_matches[:, pattern_id]
+    return found if present else ~found
+
+_COLUMN_EXTRACTORS: Dict[str, Callable[[List[ProcessedDataRecord]], np.ndarray]] = {
+    "url_domain": _extract_domains,
+    "action_type": _extract_action_types,
+}
+
+_MASK_BUILDERS: Dict[str, Callable[..., np.ndarray]] = {
+    "url_domain": _url_domain_mask,
+    "action_type": _action_type_mask,
+    "html_regex": _html_regex_mask,
+}
+
+# filter_records splits inputs of at least this many records (and at least 4 chunks) across worker processes
+PARALLEL_FILTER_MIN_RECORDS = 10_000
+DEFAULT_FILTER_CHUNK_SIZE = 1024
+
+# Per-process state for parallel filtering, set once by the pool initializer. Under the "fork" start
+# method the records are inherited rather than pickled, so tasks only carry index ranges.
+_worker_filter: Optional["DataFilter"] = None
+_worker_records: Optional[List[ProcessedDataRecord]] = None
+
+def _init_filter_worker(data_filter: "DataFilter", records: List[ProcessedDataRecord]) -> None:
+    global _worker_filter, _worker_records
+    _worker_filter, _worker_records = data_filter, records
+
+def _filter_chunk(start: int, stop: int) -> List[int]:
+    '''Returns the indices (into the full record list) of the records in [start, stop) that pass.'''
+    return [start + i for i in _worker_filter._keep_indices(_worker_records[start:stop])]
+
 class DataFilter:
     '''
     Applies a series of filters to a list of ProcessedDataRecord objects.
     Filters can be predefined (like by URL domain) or custom callables.
+    Predefined filters are kept as (kind, params) entries rather than closures so that
+    filter_records can evaluate them column-wise over all records at once.
     '''
     def __init__(self, filters: Optional[List[FilterCallable]] = None):
         self.filters: List[FilterCallable] = filters if filters is not None else []
+        self._builtin_filters: List[Tuple[str, Tuple[Any, ...]]] = []
+        self._html_regex_bank = _HtmlRegexBank()
+        self._column_extractors: Dict[str, Callable[[List[ProcessedDataRecord]], np.ndarray]] = {
+            **_COLUMN_EXTRACTORS,
+            "html_regex": self._html_regex_bank.scan, # All HTML patterns are matched in one pass
+        }
 
     def add_filter(self, filter_func: FilterCallable):
         '''Adds a custom filter function.'''
@@ -25,20 +201,64 @@ class DataFilter:
             raise FilteringError("Provided filter must be a callable function.")
         self.filters.append(filter_func)
 
-    def filter_records(self, records: List[ProcessedDataRecord]) -> List[ProcessedDataRecord]:
+    def filter_records(
+        self,
+        records: List[ProcessedDataRecord],
+        workers: int = 1,
+        chunk_size: int = DEFAULT_FILTER_CHUNK_SIZE
+    ) -> List[ProcessedDataRecord]:
         '''
         Applies all registered filters to a list of records.
         Returns a new list containing only the records that pass all filters.
-        For large datasets, this should ideally be a generator or operate on iterables.
+        Filtering runs in-process by default. With workers > 1, large inputs are filtered in
+        chunks of chunk_size across that many processes, provided the filters can be pickled;
+        lambdas and other closures passed to add_filter cannot, in which case filtering stays in-process.
         '''
-        if not self.filters:
+        if not self.filters and not self._builtin_filters:
             return records # No filters, return all records
-        
-        filtered_records = []
-        for record in records:
-            if self._passes_all_filters(record):
-                filtered_records.append(record)
-        return filtered_records
+
+        if workers > 1 and len(records) >= max(PARALLEL_FILTER_MIN_RECORDS, 4 * chunk_size) and self._is_picklable():
+            return self._filter_records_parallel(records, workers, chunk_size)
+        return self.filter_records_bulk(records)
+
+    def _is_picklable(self) -> bool:
+        try:
+            pickle.dumps(self)
+            return True
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return False
+
+    def _filter_records_parallel(self, records: List[ProcessedDataRecord], workers: int, chunk_size: int) -> List[ProcessedDataRecord]:
+        starts = range(0, len(records), chunk_size)
+        stops = [min(start + chunk_size, len(records)) for start in starts]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_filter_worker, initargs=(self, records)) as executor:
+            kept_chunks = list(executor.map(_filter_chunk, starts, stops))
+        return [records[i] for kept in kept_chunks for i in kept]
+
+    def filter_records_bulk(self, records: List[ProcessedDataRecord]) -> List[ProcessedDataRecord]:
+        '''
+        Vectorized filtering: each column the built-in filters need (domains, action types, HTML)
+        is extracted once, every built-in filter becomes a boolean mask over it, and the masks are
+        combined with &. Custom callables then run per record, only on the records still kept.
+        '''
+        return [records[i] for i in self._keep_indices(records)]
+
+    def _keep_indices(self, records: List[ProcessedDataRecord]) -> List[int]:
+        '''Indices of the records that pass every filter, in input order.'''
+        if not records:
+            return []
+
+        mask = np.ones(len(records), dtype=bool)
+        columns: Dict[str, np.ndarray] = {}
+        for kind, params in self._builtin_filters:
+            if kind not in columns:
+                columns[kind] = self._column_extractors[kind](records)
+            mask &= _MASK_BUILDERS[kind](columns[kind], *params)
+
+        kept = np.flatnonzero(mask).tolist()
+        if self.filters:
+            kept = [i for i in kept if self._passes_all_filters(records[i])]
+        return kept
     
     def _passes_all_filters(self, record: ProcessedDataRecord) -> bool:
         '''Checks if a single record passes all registered filters.'''
@@ -47,9 +267,12 @@ class DataFilter:
                 if not filter_func(record):
                     return False # Record failed one of the filters
             except Exception as e:
-                # Optionally log this error or handle specific exceptions
-                # For now, treat filter errors as a failure for that record to be safe
-                print(f"Warning: Filter function {filter_func.__name__ if hasattr(filter_func, '__name__') else 'custom_filter'} raised an error on record {record.step_id}: {e}. Record excluded.")
+                # Treat filter errors as a failure for that record to be safe.
+                # Lazy %-formatting: nothing is formatted when WARNING is disabled.
+                logger.warning(
+                    "Filter function %s raised an error on record %s: %s. Record excluded.",
+                    getattr(filter_func, '__name__', 'custom_filter'), record.step_id, e
+                )
                 return False
         return True # Record passed all filters
 
@@ -57,40 +280,26 @@ class DataFilter:
     # These methods create and add common types of filters.
 
     def add_filter_by_url_domain(self, domains_to_keep: Optional[List[str]] = None, domains_to_exclude: Optional[List[str]] = None):
-        '''Adds a filter to keep or exclude records based on URL domain.'''
+        '''
+        Adds a filter to keep or exclude records based on URL domain.
+        A domain matches itself and its subdomains ("example.com" matches "sub.example.com"
+        but not "notexample.com"). Exclusion takes precedence over keep.
+        '''
         if not domains_to_keep and not domains_to_exclude:
             raise FilteringError("Must provide either domains_to_keep or domains_to_exclude for URL domain filter.")
 
-        def domain_filter(record: ProcessedDataRecord) -> bool:
-            try:
-                parsed_url = urlparse(str(record.url))
-                domain = parsed_url.netloc.lower()
-                if domains_to_keep:
-                    if not any(kept_domain.lower() in domain for kept_domain in domains_to_keep):
-                        return False # Not in the keep list
-                if domains_to_exclude:
-                    if any(excluded_domain.lower() in domain for excluded_domain in domains_to_exclude):
-                        return False # In the exclude list
-                return True
-            except Exception:
-                return False # Error parsing URL, exclude record
-        self.add_filter(domain_filter)
+        keep = frozenset(domain.lower().strip('.') for domain in domains_to_keep or ())
+        exclude = frozenset(domain.lower().strip('.') for domain in domains_to_exclude or ())
+        self._builtin_filters.append(("url_domain", (keep, exclude)))
 
     def add_filter_by_action_type(self, action_types_to_keep: Optional[List[str]] = None, action_types_to_exclude: Optional[List[str]] = None):
         '''Adds a filter based on action type (e.g., "click", "input").'''
         if not action_types_to_keep and not action_types_to_exclude:
             raise FilteringError("Must provide either action_types_to_keep or action_types_to_exclude for action type filter.")
 
-        def action_type_filter(record: ProcessedDataRecord) -> bool:
-            action_type_lower = record.action.type.lower()
-            if action_types_to_keep:
-                if not any(kept_type.lower() == action_type_lower for kept_type in action_types_to_keep):
-                    return False
-            if action_types_to_exclude:
-                if any(excluded_type.lower() == action_type_lower for excluded_type in action_types_to_exclude):
-                    return False
-            return True
-        self.add_filter(action_type_filter)
+        keep = tuple(action_type.lower() for action_type in action_types_to_keep or ())
+        exclude = tuple(action_type.lower() for action_type in action_types_to_exclude or ())
+        self._builtin_filters.append(("action_type", (keep, exclude)))
 
     def add_filter_by_html_content_regex(self, pattern: Union[str, Pattern], present: bool = True):
         '''
@@ -107,14 +316,9 @@ class DataFilter:
                 raise FilteringError(f"Invalid regex pattern for HTML content filter: {e}") from e
         else:
             compiled_pattern = pattern
-        
-        def html_regex_filter(record: ProcessedDataRecord) -> bool:
-            if record.html_content is None:
-                return not present # If HTML must be present and it's not, filter out. If must NOT be present and it's not, keep.
-            
-            match_found = bool(compiled_pattern.search(record.html_content))
-            return match_found if present else not match_found
-        self.add_filter(html_regex_filter)
+        # If HTML is missing the pattern counts as not found: filtered out when present=True, kept otherwise.
+        pattern_id = self._html_regex_bank.add(compiled_pattern)
+        self._builtin_filters.append(("html_regex", (pattern_id, present)))
     
     # TODO: Add filters for "workflow type" and "success/failure" when these fields are defined
     # in ProcessedDataRecord or accessible via metadata.
@@ -126,6 +330,9 @@ class DataFilter:
     #         return False # No metadata to check status
     #     self.add_filter(status_filter)
 
+# Alias under the name used by the tests and newer callers.
+DataFilterer = DataFilter
+
 # Example usage:
 if __name__ == '__main__':
     from .types import ActionDetail # For example instantiation
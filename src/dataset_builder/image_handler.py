@@ -2,7 +2,7 @@
 Module for handling image-related operations in the dataset builder.
 '''
 
-from typing import Optional, Tuple, Union, Dict, Any
+from typing import Optional, Tuple, Union, Dict, Any, BinaryIO
 import os
 import logging
 from PIL import Image, UnidentifiedImageError
@@ -192,21 +192,22 @@ class ImageHandler:
             logger.error(f"Unexpected error uploading {local_file_path} to s3://{bucket}/{s3_key}: {e}", exc_info=True)
             raise ImageProcessingError(f"Unexpected error uploading {local_file_path}: {e}") from e
 
-    def load_image(self, image_path: str) -> Image.Image:
+    def load_image(self, image_path: Union[str, BinaryIO]) -> Image.Image:
         """
-        Loads an image from the given file path.
+        Loads an image from the given file path or binary file-like object.
 
         Args:
-            image_path: Path to the image file.
+            image_path: Path to the image file, or a binary file-like object (e.g. io.BytesIO)
+                holding encoded image data, which is read without touching the filesystem.
 
         Returns:
             A PIL Image object.
 
         Raises:
-            FileNotFoundError: If the image_path does not exist.
-            ImageProcessingError: If the image cannot be opened or is not a valid image.
+            FileNotFoundError: If image_path is a path that does not exist (never raised for file-like objects).
+            ImageProcessingError: If the path or file-like object cannot be opened or does not hold a valid image.
         """
-        if not os.path.exists(image_path):
+        if not hasattr(image_path, "read") and not os.path.exists(image_path):
             logger.error(f"Image file not found at path: {image_path}")
             raise FileNotFoundError(f"Image file not found at path: {image_path}")
         try:
@@ -293,8 +294,22 @@ class ImageHandler:
             logger.debug(f"Converted image to RGB mode.")
         
         # Convert PIL image to NumPy array
-        img_array = np.array(image, dtype=np.float32)
+        img_array = self._normalize_array(np.array(image, dtype=np.float32))
         
+        normalized_pil_image = Image.fromarray(img_array, 'RGB')
+        logger.debug(f"Converted normalized array back to PIL Image. Mode: {normalized_pil_image.mode}")
+        return normalized_pil_image
+
+    def _normalize_array(self, img_array: np.ndarray) -> np.ndarray:
+        """
+        Scales a float32 RGB array to [0.0, 1.0] (if it is still in [0, 255]) and back to uint8 for PIL.
+
+        Args:
+            img_array: float32 array of shape (H, W, 3), either in [0, 255] or already in [0.0, 1.0].
+
+        Returns:
+            A uint8 array in [0, 255] ready for Image.fromarray.
+        """
         # Rescale pixels from [0, 255] to [0.0, 1.0]
         # Perform a check to ensure that the image is indeed in [0,255] range before division
         if np.max(img_array) > 1.0: # A simple check, assumes 8-bit image if not already float [0,1]
@@ -308,10 +323,7 @@ class ImageHandler:
         # For consistency, if we scaled to [0,1] float, scale back to [0,255] uint8 for PIL.
         if np.max(img_array) <= 1.0 and img_array.dtype == np.float32:
             img_array = (img_array * 255).astype(np.uint8)
-        
-        normalized_pil_image = Image.fromarray(img_array, 'RGB')
-        logger.debug(f"Converted normalized array back to PIL Image. Mode: {normalized_pil_image.mode}")
-        return normalized_pil_image
+        return img_array
 
     def augment_image(self, image: Image.Image) -> Image.Image:
         """
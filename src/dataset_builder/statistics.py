@@ -2,13 +2,22 @@
 Module for dataset statistics calculation.
 '''
 
+import logging
 from collections import Counter
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 from urllib.parse import urlparse
 
 from .types import ProcessedDataRecord
 from .exceptions import DataStatisticsError
 
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=8192)
+def _extract_host(url: str) -> str:
+    '''Returns the lower-cased host (netloc) of a URL string. Cached, since datasets repeat the same hosts a lot.'''
+    return urlparse(url).netloc.lower()
+
 class DatasetStatistics:
     '''Handles calculation and reporting of dataset statistics.'''
 
@@ -68,11 +77,9 @@ class DatasetStatistics:
         domains = []
         for record in records:
             try:
-                parsed_url = urlparse(str(record.url))
-                domains.append(parsed_url.netloc.lower())
+                domains.append(_extract_host(record.url_str))
             except Exception as e:
-                # Log or handle records with unparseable URLs if necessary
-                print(f"Warning: Could not parse URL {record.url} for record {record.step_id}: {e}")
+                logger.warning("Could not parse URL %s for record %s: %s", record.url, record.step_id, e)
                 continue # Skip this record for domain stats
         
         domains_distribution = dict(Counter(domains))
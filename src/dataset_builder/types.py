@@ -47,6 +47,12 @@ class ProcessedDataRecord(BaseModel):
     # Optional field for a link to a locally processed/stored image if applicable
     processed_image_path: Optional[str] = None
 
+    @property
+    def url_str(self) -> str:
+        """str(self.url), as read by filtering, statistics and formatting. Not a field, so it is never serialized.
+        Deliberately not cached: model_copy copies the instance __dict__, so a cached value would outlive a url update."""
+        return str(self.url)
+
     @field_validator('obs_html_s3_path', 'screenshot_s3_path')
     @classmethod
     def check_s3_path(cls, v: Optional[str]) -> Optional[str]:
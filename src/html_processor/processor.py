@@ -1,6 +1,9 @@
-import gzip
+import hashlib
 import logging
-from typing import Optional, Dict
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
 
 # Use minify_html instead of htmlmin
 MINIFY_HTML_AVAILABLE = False
@@ -17,11 +20,96 @@ try:
 except ImportError:
     BeautifulSoup = None # type: ignore
 
+# lxml is a C parser, much faster than bs4's pure-Python html.parser; used for DOM diffing when installed.
+LXML_AVAILABLE = False
+try:
+    import lxml # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    pass
+
+BS4_PARSER = "lxml" if LXML_AVAILABLE else "html.parser"
+
+# selectolax (C, lexbor-backed) extracts text far faster than building a BeautifulSoup tree; is_significant_change
+# only needs the text, so it uses selectolax when installed. selectolax 1.0 dropped the Modest backend in
+# selectolax.parser, so prefer the Lexbor parser and only fall back to the old module on releases without it.
+SELECTOLAX_AVAILABLE = False
+try:
+    from selectolax.lexbor import LexborHTMLParser as SLXParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SLXParser # type: ignore
+        SELECTOLAX_AVAILABLE = True
+    except ImportError:
+        SLXParser = None # type: ignore
+
+# ISA-L's SIMD deflate (python-isal) compresses several times faster than zlib and writes standard gzip.
+ISAL_AVAILABLE = False
+try:
+    from isal import isal_zlib
+    ISAL_AVAILABLE = True
+except ImportError:
+    isal_zlib = None # type: ignore
+
+# zlib compression level -> ISA-L level (ISA-L only has 0-3). zlib level 0 means "store", which ISA-L lacks,
+# so it and anything unmapped (e.g. -1) stay on zlib.
+_ISAL_LEVELS = {1: 0, 2: 0, 3: 1, 4: 1, 5: 1, 6: 2, 7: 2, 8: 3, 9: 3}
+
+# Levenshtein (C, via rapidfuzz) gives an edit-distance ratio for the text diff; without it the length delta is used.
+LEVENSHTEIN_AVAILABLE = False
+try:
+    import Levenshtein
+    LEVENSHTEIN_AVAILABLE = True
+except ImportError:
+    Levenshtein = None # type: ignore
+
+# Tags whose contents BeautifulSoup's get_text() leaves out; stripped before selectolax extracts text to match it.
+_NON_TEXT_TAGS = ["script", "style", "template"]
+_SLX_NODE_SEPARATOR = "\x00"
+
 from .exceptions import HTMLProcessingError, MinificationError, DOMDiffError
 
 logger = logging.getLogger(__name__)
 DEFAULT_LOG_EXTRA_HTML = {"action": "html_processing"}
 
+def _extract_text(html: str) -> str:
+    """
+    Plain text of an HTML document: each text node whitespace-stripped, empty ones dropped,
+    the rest joined with single spaces (BeautifulSoup's get_text(separator=" ", strip=True)).
+    """
+    if SELECTOLAX_AVAILABLE and SLXParser:
+        tree = SLXParser(html)
+        tree.strip_tags(_NON_TEXT_TAGS)
+        if tree.root is None:
+            return ""
+        # Join on a sentinel first so empty nodes can be dropped exactly as get_text(strip=True) does.
+        raw = tree.root.text(separator=_SLX_NODE_SEPARATOR, strip=True)
+        return " ".join(part for part in raw.split(_SLX_NODE_SEPARATOR) if part)
+    return BeautifulSoup(html, BS4_PARSER).get_text(separator=" ", strip=True)
+
+# Orchestrator loops diff each snapshot against the previous one, so every document is seen twice in a row.
+# Keyed on a digest (plus the active backend) so the cache never holds on to the HTML itself.
+_TEXT_CACHE_MAXSIZE = 64
+_text_cache: "OrderedDict[Tuple[bytes, str], str]" = OrderedDict()
+_text_cache_lock = threading.Lock()
+
+def _extract_text_cached(html: str) -> str:
+    """_extract_text, memoized in a small LRU keyed by a blake2b digest of the HTML."""
+    backend = "selectolax" if SELECTOLAX_AVAILABLE and SLXParser else f"bs4:{BS4_PARSER}"
+    key = (hashlib.blake2b(html.encode("utf-8", "surrogatepass"), digest_size=16).digest(), backend)
+    with _text_cache_lock:
+        text = _text_cache.get(key)
+        if text is not None:
+            _text_cache.move_to_end(key)
+            return text
+    text = _extract_text(html)
+    with _text_cache_lock:
+        _text_cache[key] = text
+        if len(_text_cache) > _TEXT_CACHE_MAXSIZE:
+            _text_cache.popitem(last=False)
+    return text
+
 class HTMLProcessor:
     """
     Provides utilities for processing HTML content, including minification,
@@ -38,7 +126,7 @@ class HTMLProcessor:
         """
         self.config = config or {}
         log_extra = {**DEFAULT_LOG_EXTRA_HTML, "sub_action": "__init__"}
-        logger.info(f"HTMLProcessor initialized. minify-html available: {MINIFY_HTML_AVAILABLE}, BeautifulSoup available: {BS4_AVAILABLE}", extra=log_extra)
+        logger.info(f"HTMLProcessor initialized. minify-html available: {MINIFY_HTML_AVAILABLE}, BeautifulSoup available: {BS4_AVAILABLE} (parser: {BS4_PARSER}), selectolax available: {SELECTOLAX_AVAILABLE}", extra=log_extra)
 
     def minify(self, html_content: str, 
                minify_js: bool = False,
@@ -82,7 +170,8 @@ class HTMLProcessor:
 
     def gzip_compress(self, text_content: str, compression_level: int = 9) -> bytes:
         """
-        Compresses text content (typically HTML) using gzip.
+        Compresses text content (typically HTML) using gzip. Uses ISA-L when python-isal is installed
+        (levels 1-9 mapped onto its 0-3), zlib otherwise.
         Args:
             text_content (str): The text string to compress.
             compression_level (int): Gzip compression level (0-9). Defaults to 9 (max compression).
@@ -94,7 +183,14 @@ class HTMLProcessor:
         if not isinstance(text_content, str):
             raise HTMLProcessingError("text_content must be a string for gzip compression.")
         try:
-            return gzip.compress(text_content.encode('utf-8'), compresslevel=compression_level)
+            data = text_content.encode('utf-8')
+            isal_level = _ISAL_LEVELS.get(compression_level)
+            if ISAL_AVAILABLE and isal_zlib and isal_level is not None:
+                return isal_zlib.compress(data, isal_level, wbits=31)
+            # A zlib stream with the gzip wrapper (wbits=31): no GzipFile/BytesIO, and a fixed header (mtime 0),
+            # so identical HTML always compresses to identical bytes. zlib.compress only takes wbits from 3.11 on.
+            compressor = zlib.compressobj(compression_level, zlib.DEFLATED, 31)
+            return compressor.compress(data) + compressor.flush()
         except Exception as e:
             logger.exception("Error during gzip compression.", extra={**DEFAULT_LOG_EXTRA_HTML, "sub_action": "gzip_compress"})
             raise HTMLProcessingError(f"Gzip compression failed: {e}") from e
@@ -102,34 +198,36 @@ class HTMLProcessor:
     def is_significant_change(self, html_old: str, html_new: str, text_diff_threshold: float = 0.05) -> bool:
         """
         Simplified DOM diffing based on text content change percentage (MVP).
-        Compares the plain text content of two HTML documents.
+        Compares the plain text content of two HTML documents: by edit-distance ratio when the Levenshtein
+        package is installed, otherwise by the relative change in text length.
         Args:
             html_old (str): The old HTML content.
             html_new (str): The new HTML content.
-            text_diff_threshold (float): If the percentage change in text length is less than this,
+            text_diff_threshold (float): If the percentage change in text is less than this,
                                        it's considered not significant. Defaults to 0.05 (5%).
         Returns:
             bool: True if the change is considered significant, False otherwise.
         Raises:
-            DOMDiffError: If BeautifulSoup is not available or parsing fails.
+            DOMDiffError: If neither selectolax nor BeautifulSoup is available, or parsing fails.
         """
-        if not BS4_AVAILABLE or not BeautifulSoup:
-            msg = "BeautifulSoup4 not available. DOM diffing is disabled. Install with `pip install beautifulsoup4`."
+        if not SELECTOLAX_AVAILABLE and (not BS4_AVAILABLE or not BeautifulSoup):
+            msg = "selectolax and BeautifulSoup4 not available. DOM diffing is disabled. Install with `pip install beautifulsoup4` (or `selectolax`)."
             logger.error(msg, extra={**DEFAULT_LOG_EXTRA_HTML, "sub_action": "is_significant_change"})
             raise DOMDiffError(msg)
         if not isinstance(html_old, str) or not isinstance(html_new, str):
             raise DOMDiffError("Both html_old and html_new must be strings for diffing.")
 
+        # Unchanged snapshots are common in orchestrator loops; a raw string compare settles them without parsing.
+        if html_old == html_new:
+            return False
+
         try:
-            soup_old = BeautifulSoup(html_old, 'html.parser')
-            soup_new = BeautifulSoup(html_new, 'html.parser')
+            text_old = _extract_text_cached(html_old)
+            text_new = _extract_text_cached(html_new)
         except Exception as e:
             logger.error(f"Failed to parse HTML for DOM diffing: {e}", extra={**DEFAULT_LOG_EXTRA_HTML, "sub_action": "is_significant_change"})
             raise DOMDiffError(f"HTML parsing failed for diff: {e}") from e
 
-        text_old = soup_old.get_text(separator=" ", strip=True)
-        text_new = soup_new.get_text(separator=" ", strip=True)
-
         if not text_old and not text_new:
             return False 
         if not text_old or not text_new:
@@ -142,6 +240,13 @@ class HTMLProcessor:
         if len_old == 0 or len_new == 0: return True # If one is zero and other not, caught by second check
         
         abs_diff = abs(len_new - len_old)
+        if LEVENSHTEIN_AVAILABLE and Levenshtein:
+            # 1 - ratio is at least |len_new - len_old| / (len_old + len_new), so a large length change decides it
+            # without computing the distance; score_cutoff lets the C code stop once similarity falls below the bar.
+            if float(abs_diff) / (len_old + len_new) > text_diff_threshold:
+                return True
+            min_similarity = 1.0 - text_diff_threshold
+            return Levenshtein.ratio(text_old, text_new, score_cutoff=max(0.0, min_similarity)) < min_similarity
         if float(abs_diff) / max(len_old, len_new) > text_diff_threshold:
             return True
         return False
@@ -165,4 +270,32 @@ class HTMLProcessor:
         if len(html_content) > max_chars:
             logger.info(f"Capping HTML content from {len(html_content)} to {max_chars} characters.", extra={**DEFAULT_LOG_EXTRA_HTML, "sub_action": "cap_length"})
             return html_content[:max_chars]
-        return html_content 
\ No newline at end of file
+        return html_content
+
+    def cap_length_bytes(self, data: bytes, max_bytes: int = 30000) -> bytes:
+        """
+        Caps UTF-8 encoded HTML to at most max_bytes bytes, for callers that already hold bytes.
+        The cut is moved back to a character boundary, so the result always decodes cleanly.
+        Args:
+            data (bytes): The UTF-8 encoded HTML.
+            max_bytes (int): The maximum number of bytes to allow. Defaults to 30000.
+        Returns:
+            bytes: `data` itself if it is short enough, otherwise a truncated copy.
+        Raises:
+            HTMLProcessingError: If data is not bytes.
+        """
+        if not isinstance(data, bytes):
+            raise HTMLProcessingError("data must be bytes for cap_length_bytes.")
+        if not isinstance(max_bytes, int) or max_bytes < 0:
+            logger.warning(f"Invalid max_bytes ({max_bytes}) for cap_length_bytes, using default of 30000.", extra={**DEFAULT_LOG_EXTRA_HTML, "sub_action": "cap_length_bytes"})
+            max_bytes = 30000
+
+        if len(data) <= max_bytes:
+            return data
+        logger.info(f"Capping HTML content from {len(data)} to {max_bytes} bytes.", extra={**DEFAULT_LOG_EXTRA_HTML, "sub_action": "cap_length_bytes"})
+        view = memoryview(data)
+        end = max_bytes
+        # Step back over UTF-8 continuation bytes (0b10xxxxxx) so a multi-byte character is not split
+        while end > 0 and (view[end] & 0xC0) == 0x80:
+            end -= 1
+        return bytes(view[:end]) 
\ No newline at end of file
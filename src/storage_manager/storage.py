@@ -1,11 +1,14 @@
 import os
+import asyncio
 import logging
 from typing import Optional, Tuple, Dict, Any, Union, List
 import json # Added for serializing dicts
 import shutil # Added for local directory deletion
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential, before_sleep_log
 
 from . import config as sm_config # sm_config to avoid clash if this module also has a config object
 from .exceptions import StorageManagerError, S3ConfigError, S3OperationError, LocalStorageError
@@ -18,6 +21,31 @@ SCREENSHOT_FILENAME = "screenshot.png"  # Assuming PNG as a common default, can
 ACTION_DATA_FILENAME = "action.json"
 METADATA_FILENAME = "metadata.json"
 
+# S3 error codes worth retrying: throttling ("SlowDown") and server-side failures.
+# Anything else (AccessDenied, NoSuchBucket, ...) fails on the first attempt.
+_TRANSIENT_S3_ERROR_CODES = frozenset({"500", "503", "InternalError", "ServiceUnavailable", "SlowDown", "RequestTimeout"})
+S3_UPLOAD_MAX_ATTEMPTS = 3
+
+# Shared by the single client each StorageManager creates: a connection pool large enough for
+# concurrent upload bursts (see DatasetBuilder's S3 output), TCP keepalive so pooled connections
+# survive idle gaps, and botocore's adaptive mode for its client-side rate limiting on throttling.
+# botocore itself makes no retries (max_attempts counts retries after the first call): _upload_to_s3's
+# tenacity retry is the only retry layer, so a failing object costs at most S3_UPLOAD_MAX_ATTEMPTS PUTs.
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 0, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+
+def _is_transient_s3(exc: BaseException) -> bool:
+    """True if exc is an S3OperationError caused by a throttling or 5xx ClientError."""
+    if not isinstance(exc, S3OperationError) or not isinstance(exc.original_exception, ClientError):
+        return False
+    response = exc.original_exception.response
+    code = str(response.get("Error", {}).get("Code", ""))
+    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+    return code in _TRANSIENT_S3_ERROR_CODES or status >= 500
+
 class StorageManager:
     """Manages storage and retrieval of data from S3 or local filesystem.
 
@@ -94,7 +122,8 @@ class StorageManager:
     def _get_s3_client(self):
         """Initializes and returns the Boto3 S3 client.
 
-        The client is cached after the first successful initialization.
+        The client is cached after the first successful initialization and reused
+        (it is thread-safe) for every S3 call this manager makes.
         Relies on AWS credentials being available in the environment or standard
         AWS credential locations.
 
@@ -115,7 +144,7 @@ class StorageManager:
                 # 5. Assume Role provider
                 # 6. Instance IAM role (for EC2, ECS, Lambda etc.)
                 # We rely on this standard chain. No explicit credential handling here.
-                self._s3_client = boto3.client("s3", region_name=self.s3_region_name)
+                self._s3_client = boto3.client("s3", region_name=self.s3_region_name, config=S3_CLIENT_CONFIG)
                 # Perform a simple operation to test credentials and bucket access if needed, e.g., head_bucket
                 # For now, client creation is the primary check.
                 logger.debug(f"S3 client initialized for region {self.s3_region_name}")
@@ -196,10 +225,17 @@ class StorageManager:
             logger.error(f"Unexpected error checking S3 object existence for key {s3_key}: {e}", exc_info=True)
             raise StorageManagerError(f"Unexpected error checking S3 object existence {s3_key}: {e}") from e
 
+    @retry(
+        stop=stop_after_attempt(S3_UPLOAD_MAX_ATTEMPTS),
+        wait=wait_exponential(multiplier=1, max=4),
+        retry=retry_if_exception(_is_transient_s3),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True,
+    )
     async def _upload_to_s3(self, data: Union[str, bytes], s3_key: str, content_type: Optional[str] = None) -> str:
         """Uploads data (bytes or string) to S3. (Async wrapper)"""
-        # The actual s3_client.put_object call is blocking.
-        # For true async, use aiobotocore or run in executor.
+        # The blocking put_object call runs in a worker thread (boto3 clients are thread-safe),
+        # so several uploads awaited together with asyncio.gather proceed concurrently.
         s3_client = self._get_s3_client()
         try:
             body_data = data.encode('utf-8') if isinstance(data, str) else data
@@ -207,10 +243,10 @@ class StorageManager:
             if content_type:
                 extra_args['ContentType'] = content_type
             
-            # This is a blocking call
-            s3_client.put_object(
-                Bucket=self.s3_bucket_name, 
-                Key=s3_key, 
+            await asyncio.to_thread(
+                s3_client.put_object,
+                Bucket=self.s3_bucket_name,
+                Key=s3_key,
                 Body=body_data,
                 **extra_args
             )
@@ -0,0 +1,150 @@
+"""Shared fixtures for dataset_builder tests."""
+
+import hashlib
+import io
+from typing import Any, Dict, Optional, Tuple
+from unittest.mock import patch
+
+import pytest
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+_FAKE_AWS_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_SECURITY_TOKEN": "testing",
+    "AWS_SESSION_TOKEN": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+@pytest.fixture(scope="session", autouse=True)
+def aws_credentials():
+    """Mocked AWS credentials for moto, set once per session.
+
+    With explicit env credentials botocore resolves immediately instead of walking the
+    credential chain (shared config files, instance metadata) on every client creation.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in _FAKE_AWS_ENV.items():
+            mp.setenv(name, value)
+        yield
+
+
+class FakeS3Backend:
+    """Dict-backed stand-in for the S3 operations the dataset_builder tests exercise.
+
+    Installed in place of ``BaseClient._make_api_call``, so requests never go through
+    moto's per-request HTTP/XML pipeline: API params in, response dicts out.
+    Objects are stored as ``buckets[bucket][key] -> (body, content_type)``.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[str, Dict[str, Tuple[bytes, Optional[str]]]] = {}
+
+    def __call__(self, client, operation_name: str, api_params: Dict[str, Any]) -> Dict[str, Any]:
+        service = client.meta.service_model.service_name
+        handler = getattr(self, f"_op_{operation_name}", None) if service == "s3" else None
+        if handler is None:
+            raise NotImplementedError(f"FakeS3Backend does not implement {service}.{operation_name}")
+        return handler(operation_name, **api_params)
+
+    def put(self, bucket: str, key: str, body: bytes, content_type: Optional[str] = None) -> None:
+        """Stores an object directly, for test setup that does not need to go through a client."""
+        self.buckets[bucket][key] = (bytes(body), content_type)
+
+    def get(self, bucket: str, key: str) -> Optional[bytes]:
+        """Stored body of ``bucket/key``, or None if there is no such object."""
+        obj = self.buckets.get(bucket, {}).get(key)
+        return obj[0] if obj is not None else None
+
+    @staticmethod
+    def _error(operation_name: str, code: str, status: int, message: str = "") -> ClientError:
+        return ClientError(
+            {"Error": {"Code": code, "Message": message or code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+            operation_name,
+        )
+
+    @staticmethod
+    def _ok(status: int = 200, **fields) -> Dict[str, Any]:
+        return {"ResponseMetadata": {"HTTPStatusCode": status}, **fields}
+
+    def _bucket(self, operation_name: str, bucket: str) -> Dict[str, Tuple[bytes, Optional[str]]]:
+        try:
+            return self.buckets[bucket]
+        except KeyError:
+            raise self._error(operation_name, "NoSuchBucket", 404, f"The specified bucket does not exist: {bucket}") from None
+
+    def _object(self, operation_name: str, bucket: str, key: str, missing_code: str) -> Tuple[bytes, Optional[str]]:
+        try:
+            return self._bucket(operation_name, bucket)[key]
+        except KeyError:
+            raise self._error(operation_name, missing_code, 404, f"The specified key does not exist: {key}") from None
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def _op_CreateBucket(self, operation_name, Bucket, **_):
+        if Bucket in self.buckets:
+            raise self._error(operation_name, "BucketAlreadyOwnedByYou", 409)
+        self.buckets[Bucket] = {}
+        return self._ok(Location=f"/{Bucket}")
+
+    def _op_PutObject(self, operation_name, Bucket, Key, Body=b"", ContentType=None, **_):
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        self._bucket(operation_name, Bucket)[Key] = (bytes(Body), ContentType)
+        return self._ok(ETag=self._etag(Body))
+
+    def _op_HeadObject(self, operation_name, Bucket, Key, **_):
+        body, content_type = self._object(operation_name, Bucket, Key, missing_code="404")
+        return self._ok(ContentLength=len(body), ContentType=content_type or "binary/octet-stream", ETag=self._etag(body))
+
+    def _op_GetObject(self, operation_name, Bucket, Key, Range=None, IfMatch=None, **_):
+        body, content_type = self._object(operation_name, Bucket, Key, missing_code="NoSuchKey")
+        etag = self._etag(body)
+        if IfMatch is not None and IfMatch != etag:
+            raise self._error(operation_name, "PreconditionFailed", 412)
+        fields = {"ContentType": content_type or "binary/octet-stream", "ETag": etag}
+        status = 200
+        if Range:
+            start, _, end = Range.removeprefix("bytes=").partition("-")
+            start, end = int(start), min(int(end) if end else len(body) - 1, len(body) - 1)
+            fields["ContentRange"] = f"bytes {start}-{end}/{len(body)}"
+            body, status = body[start:end + 1], 206
+        return self._ok(status, Body=StreamingBody(io.BytesIO(body), len(body)), ContentLength=len(body), **fields)
+
+    def _op_DeleteObject(self, operation_name, Bucket, Key, **_):
+        self._bucket(operation_name, Bucket).pop(Key, None)
+        return self._ok(204)
+
+    def _op_DeleteObjects(self, operation_name, Bucket, Delete, **_):
+        objects = self._bucket(operation_name, Bucket)
+        for obj in Delete.get("Objects", []):
+            objects.pop(obj["Key"], None)
+        return self._ok(Deleted=[{"Key": obj["Key"]} for obj in Delete.get("Objects", [])])
+
+    def _op_ListObjectsV2(self, operation_name, Bucket, Prefix="", **_):
+        contents = [
+            {"Key": key, "Size": len(body), "ETag": self._etag(body)}
+            for key, (body, _) in sorted(self._bucket(operation_name, Bucket).items())
+            if key.startswith(Prefix)
+        ]
+        listing = self._ok(Name=Bucket, Prefix=Prefix, KeyCount=len(contents), IsTruncated=False)
+        if contents:
+            listing["Contents"] = contents
+        return listing
+
+@pytest.fixture(scope="module")
+def fake_s3() -> FakeS3Backend:
+    """Routes every botocore S3 call made during the module to a fresh in-memory FakeS3Backend."""
+    backend = FakeS3Backend()
+
+    def _make_api_call(client, operation_name, api_params):
+        return backend(client, operation_name, api_params)
+
+    with patch.object(BaseClient, "_make_api_call", _make_api_call):
+        yield backend
@@ -4,14 +4,18 @@ Tests for the DatasetBuilder.
 import pytest
 import os
 import json
-from unittest.mock import MagicMock, patch, call
+import orjson
+import functools
+from unittest.mock import MagicMock, AsyncMock, patch, call, mock_open, DEFAULT
 import shutil
 import tempfile
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 import boto3 # Added for S3
 from moto import mock_aws # Added for S3 mocking
 from botocore.exceptions import ClientError # Added for S3 errors
 
-from src.dataset_builder.builder import DatasetBuilder
+from src.dataset_builder.builder import DatasetBuilder, DEFAULT_READ_BATCH_SIZE, PYARROW_AVAILABLE
 # Assuming other components are imported if needed for mock type hinting or direct use in tests
 from src.dataset_builder.image_handler import ImageHandler
 from src.dataset_builder.filtering import DataFilter
@@ -19,51 +23,72 @@ from src.dataset_builder.splitting import DataSplitter
 from src.dataset_builder.formatting import JsonlFormatter
 from src.dataset_builder.statistics import DatasetStatistics
 from src.dataset_builder.types import ProcessedDataRecord, ActionDetail # For creating mock data
-from pydantic import HttpUrl
+from pydantic import HttpUrl, TypeAdapter
 from src.storage_manager.storage import StorageManager, ACTION_DATA_FILENAME # Added for S3 tests
 from src.storage_manager.exceptions import S3OperationError # Added for S3 tests
 
-# Sample data (can be expanded)
-MOCK_ACTION_1 = ActionDetail(type="click", selector="#btn1")
-MOCK_ACTION_2 = ActionDetail(type="type", selector="#input", text="test value")
-
-MOCK_RECORD_1 = ProcessedDataRecord(
-    step_id="step_001", 
-    session_id="sess_abc", 
-    ts=1678886400, 
-    action=MOCK_ACTION_1, 
-    html_content="<div>Page 1</div>", 
-    obs_html_s3_path="s3://bucket/dom1.html.gz",
-    screenshot_s3_path="s3://bucket/img1.png", 
-    url="http://example.com/page1", 
-)
-MOCK_RECORD_2 = ProcessedDataRecord(
-    step_id="step_002", 
-    session_id="sess_abc", 
-    ts=1678886405, 
-    action=MOCK_ACTION_2, 
-    html_content="<div>Page 2</div>", 
-    obs_html_s3_path="s3://bucket/dom2.html.gz",
-    screenshot_s3_path="s3://bucket/img2.png", 
-    url="http://example.com/page2", 
-)
-
-MOCK_RECORDS = [MOCK_RECORD_1, MOCK_RECORD_2]
-
-@pytest.fixture
-def mock_builder_components(mocker):
+# Output file names written by DatasetBuilder.build_dataset
+TRAIN_JSONL, VAL_JSONL, STATS_JSON = "train.jsonl", "validation.jsonl", "dataset_stats.json"
+
+def _ls(path) -> set[str]:
+    """Names in a directory from a single scandir call (empty if the directory was never created)."""
+    try:
+        return {entry.name for entry in os.scandir(path)}
+    except FileNotFoundError:
+        return set()
+
+# Shared adapter: validates a whole batch of records in one pass through pydantic-core
+_ADAPTER = TypeAdapter(list[ProcessedDataRecord])
+
+# Sample data (can be expanded). A tuple, since the records are shared by every test in the module
+# and no test should be able to append to or reorder them.
+@functools.cache
+def _mock_records() -> tuple[ProcessedDataRecord, ...]:
+    """Validates the shared sample records once; later calls return the same tuple."""
+    return tuple(_ADAPTER.validate_python([
+        {
+            "step_id": "step_001",
+            "session_id": "sess_abc",
+            "ts": 1678886400,
+            "action": {"type": "click", "selector": "#btn1"},
+            "html_content": "<div>Page 1</div>",
+            "obs_html_s3_path": "s3://bucket/dom1.html.gz",
+            "screenshot_s3_path": "s3://bucket/img1.png",
+            "url": "http://example.com/page1",
+        },
+        {
+            "step_id": "step_002",
+            "session_id": "sess_abc",
+            "ts": 1678886405,
+            "action": {"type": "type", "selector": "#input", "text": "test value"},
+            "html_content": "<div>Page 2</div>",
+            "obs_html_s3_path": "s3://bucket/dom2.html.gz",
+            "screenshot_s3_path": "s3://bucket/img2.png",
+            "url": "http://example.com/page2",
+        },
+    ]))
+
+MOCK_RECORDS = _mock_records()
+MOCK_RECORD_1, MOCK_RECORD_2 = MOCK_RECORDS
+
+# Class-scoped (not module-scoped) so the constructor patches stay confined to TestDatasetBuilderUnit;
+# the integration tests in this module need the real components. Per-test state is cleared by
+# TestDatasetBuilderUnit._reset_mocks.
+@pytest.fixture(scope="class")
+def mock_builder_components(class_mocker):
     """Mocks all components initialized by DatasetBuilder."""
-    mock_image_handler = mocker.MagicMock(spec=ImageHandler)
-    mock_formatter = mocker.MagicMock(spec=JsonlFormatter)
-    mock_filter = mocker.MagicMock(spec=DataFilter)
-    mock_splitter = mocker.MagicMock(spec=DataSplitter)
-    mock_stats_generator = mocker.MagicMock(spec=DatasetStatistics)
-
-    patched_image_handler_constructor = mocker.patch('src.dataset_builder.builder.ImageHandler', return_value=mock_image_handler)
-    patched_formatter_constructor = mocker.patch('src.dataset_builder.builder.JsonlFormatter', return_value=mock_formatter)
-    patched_filter_constructor = mocker.patch('src.dataset_builder.builder.DataFilter', return_value=mock_filter)
-    patched_splitter_constructor = mocker.patch('src.dataset_builder.builder.DataSplitter', return_value=mock_splitter)
-    patched_stats_constructor = mocker.patch('src.dataset_builder.builder.DatasetStatistics', return_value=mock_stats_generator)
+    # Plain namespaces carrying MagicMocks only for the methods the builder calls; no class introspection needed
+    mock_image_handler = SimpleNamespace(get_image_reference=MagicMock())
+    mock_formatter = SimpleNamespace(write_to_jsonl=MagicMock())
+    mock_filter = SimpleNamespace(filter_records=MagicMock(), update_config=MagicMock())
+    mock_splitter = SimpleNamespace(split_data=MagicMock())
+    mock_stats_generator = SimpleNamespace(calculate_statistics=MagicMock())
+
+    patched_image_handler_constructor = class_mocker.patch('src.dataset_builder.builder.ImageHandler', return_value=mock_image_handler)
+    patched_formatter_constructor = class_mocker.patch('src.dataset_builder.builder.JsonlFormatter', return_value=mock_formatter)
+    patched_filter_constructor = class_mocker.patch('src.dataset_builder.builder.DataFilter', return_value=mock_filter)
+    patched_splitter_constructor = class_mocker.patch('src.dataset_builder.builder.DataSplitter', return_value=mock_splitter)
+    patched_stats_constructor = class_mocker.patch('src.dataset_builder.builder.DatasetStatistics', return_value=mock_stats_generator)
     
     return {
         "image_handler": mock_image_handler,
@@ -78,7 +103,31 @@ def mock_builder_components(mocker):
         "PatchedDatasetStatisticsConstructor": patched_stats_constructor
     }
 
+# One patcher for the builder's filesystem/serialization names; the mocks arrive as keyword arguments
+_patch_builder_io = patch.multiple('src.dataset_builder.builder', os=DEFAULT, open=DEFAULT, json=DEFAULT)
+
+def _configure_io_mocks(io_mocks):
+    """
+    Keeps real path handling on the patched os module, gives the patched open the
+    mock_open file/context-manager protocol, and returns the (os, json, open) mocks.
+    """
+    io_mocks["os"].path = os.path
+    mock_open(io_mocks["open"])
+    return io_mocks["os"], io_mocks["json"], io_mocks["open"]
+
 class TestDatasetBuilderUnit:
+    pytestmark = pytest.mark.unit
+
+    @pytest.fixture(autouse=True)
+    def _reset_mocks(self, mock_builder_components):
+        """Clears calls (and component return values) left on the shared mocks by the previous test."""
+        for name, mock in mock_builder_components.items():
+            if name.startswith("Patched"):
+                mock.reset_mock() # Constructors must keep returning the component stubs
+            else:
+                for method_mock in vars(mock).values():
+                    method_mock.reset_mock(return_value=True, side_effect=True)
+
     def test_initialization(self, mock_builder_components):
         """Test DatasetBuilder initializes its components."""
         builder = DatasetBuilder(config={"some_config": "value"})
@@ -100,12 +149,9 @@ class TestDatasetBuilderUnit:
         builder = DatasetBuilder(config={"filtering": filter_conf})
         mock_builder_components["PatchedDataFilterConstructor"].assert_called_once_with(filter_conf)
 
-    @patch('src.dataset_builder.builder.os.makedirs')
-    @patch('src.dataset_builder.builder.open', new_callable=MagicMock)
-    @patch('src.dataset_builder.builder.json.dump')
-    async def test_build_dataset_flow_with_data(
-        self, mock_json_dump, mock_open, mock_makedirs, mock_builder_components, tmp_path
-    ):
+    @_patch_builder_io
+    async def test_build_dataset_flow_with_data(self, mock_builder_components, tmp_path, **io_mocks):
+        mock_os, mock_json, mock_file_open = _configure_io_mocks(io_mocks)
         builder = DatasetBuilder()
         
         mock_filter = mock_builder_components["filter"]
@@ -116,8 +162,7 @@ class TestDatasetBuilderUnit:
         mock_input_path = "s3://input-data/"
         mock_output_dir = str(tmp_path / "output_dataset")
 
-        builder._load_processed_data = MagicMock()
-        builder._load_processed_data.return_value = MOCK_RECORDS
+        builder._load_processed_data = AsyncMock(return_value=MOCK_RECORDS)
         
         filtered_subset = [MOCK_RECORD_1]
         mock_filter.filter_records.return_value = filtered_subset
@@ -137,34 +182,30 @@ class TestDatasetBuilderUnit:
             filter_options={"some_filter": "value"}
         )
 
-        builder._load_processed_data.assert_called_once_with(mock_input_path)
+        builder._load_processed_data.assert_called_once_with(mock_input_path, batch_size=DEFAULT_READ_BATCH_SIZE)
         
         mock_filter.update_config.assert_called_once_with({"some_filter": "value"})
         mock_filter.filter_records.assert_called_once_with(MOCK_RECORDS)
         
         mock_splitter.split_data.assert_called_once_with(filtered_subset, 0.8)
         
-        mock_makedirs.assert_called_once_with(mock_output_dir, exist_ok=True)
+        mock_os.makedirs.assert_called_once_with(mock_output_dir, exist_ok=True)
         
-        expected_train_path = os.path.join(mock_output_dir, "train.jsonl")
-        expected_stats_path = os.path.join(mock_output_dir, "dataset_stats.json")
+        expected_train_path = os.path.join(mock_output_dir, TRAIN_JSONL)
+        expected_stats_path = os.path.join(mock_output_dir, STATS_JSON)
 
         mock_formatter.write_to_jsonl.assert_called_once_with(train_subset, expected_train_path, True)
         mock_stats_generator.calculate_statistics.assert_called_once_with(filtered_subset)
         
-        mock_open.assert_called_once_with(expected_stats_path, 'w')
-        mock_json_dump.assert_called_once_with(mock_stats_data, mock_open().__enter__(), indent=4)
-
-    @patch('src.dataset_builder.builder.os.makedirs')
-    @patch('src.dataset_builder.builder.open', new_callable=MagicMock)
-    @patch('src.dataset_builder.builder.json.dump')
-    async def test_build_dataset_no_input_data(
-        self, mock_json_dump, mock_open, mock_makedirs, mock_builder_components, tmp_path
-    ):
+        mock_file_open.assert_called_once_with(expected_stats_path, 'w')
+        mock_json.dump.assert_called_once_with(mock_stats_data, mock_file_open.return_value.__enter__.return_value, indent=4)
+
+    @_patch_builder_io
+    async def test_build_dataset_no_input_data(self, mock_builder_components, tmp_path, **io_mocks):
+        mock_os, mock_json, mock_file_open = _configure_io_mocks(io_mocks)
         builder = DatasetBuilder()
         mock_output_dir = str(tmp_path / "empty_dataset")
-        builder._load_processed_data = MagicMock()
-        builder._load_processed_data.return_value = []
+        builder._load_processed_data = AsyncMock(return_value=[])
         
         mock_filter = mock_builder_components["filter"]
         mock_splitter = mock_builder_components["splitter"]
@@ -175,21 +216,17 @@ class TestDatasetBuilderUnit:
 
         await builder.build_dataset(input_path="any_input", output_path=mock_output_dir)
 
-        mock_makedirs.assert_called_once_with(mock_output_dir, exist_ok=True)
+        mock_os.makedirs.assert_called_once_with(mock_output_dir, exist_ok=True)
         mock_formatter.write_to_jsonl.assert_not_called()
         mock_stats_generator.calculate_statistics.assert_not_called() 
-        mock_json_dump.assert_not_called()
-
-    @patch('src.dataset_builder.builder.os.makedirs')
-    @patch('src.dataset_builder.builder.open', new_callable=MagicMock)
-    @patch('src.dataset_builder.builder.json.dump')
-    async def test_build_dataset_invalid_train_split(
-        self, mock_json_dump, mock_open, mock_makedirs, mock_builder_components, tmp_path
-    ):
+        mock_json.dump.assert_not_called()
+
+    @pytest.mark.parametrize("train_split", [0, 1])
+    @_patch_builder_io
+    def test_build_dataset_invalid_train_split(self, mock_builder_components, tmp_path, train_split, **io_mocks):
+        mock_os, mock_json, mock_file_open = _configure_io_mocks(io_mocks)
         builder = DatasetBuilder()
-        mock_output_dir = str(tmp_path / "invalid_split_dataset")
-        builder._load_processed_data = MagicMock()
-        builder._load_processed_data.return_value = MOCK_RECORDS
+        mock_output_dir = str(tmp_path / "invalid_split_dataset") # tmp_path already differs per parameter
         
         mock_filter = mock_builder_components["filter"]
         mock_filter.filter_records.return_value = MOCK_RECORDS
@@ -198,61 +235,106 @@ class TestDatasetBuilderUnit:
         mock_stats_generator = mock_builder_components["stats_generator"]
         mock_stats_generator.calculate_statistics.return_value = {"total": len(MOCK_RECORDS)}
 
-        await builder.build_dataset(input_path="any", output_path=mock_output_dir, train_split=0)
+        # Records are already in hand; only the post-load steps depend on train_split
+        builder._build_from_records(MOCK_RECORDS, mock_output_dir, train_split=train_split)
         
         mock_splitter.split_data.assert_not_called()
-        expected_train_path = os.path.join(mock_output_dir, "train.jsonl")
+        expected_train_path = os.path.join(mock_output_dir, TRAIN_JSONL)
         mock_formatter.write_to_jsonl.assert_called_once_with(MOCK_RECORDS, expected_train_path, False)
-        val_path = os.path.join(mock_output_dir, "validation.jsonl")
-        assert not os.path.exists(val_path)
-        mock_formatter.reset_mock()
+        assert VAL_JSONL not in _ls(mock_output_dir)
 
-        output_dir_split1 = str(tmp_path / "invalid_split_dataset_1")
-        await builder.build_dataset(input_path="any", output_path=output_dir_split1, train_split=1)
-        mock_splitter.split_data.assert_not_called()
-        expected_train_path_1 = os.path.join(output_dir_split1, "train.jsonl")
-        mock_formatter.write_to_jsonl.assert_called_once_with(MOCK_RECORDS, expected_train_path_1, False)
-        val_path_1 = os.path.join(output_dir_split1, "validation.jsonl")
-        assert not os.path.exists(val_path_1)
+    async def test_build_dataset_forwards_read_batch_size(self, mock_builder_components, tmp_path):
+        builder = DatasetBuilder()
+        builder._load_processed_data = AsyncMock(return_value=MOCK_RECORDS)
+        output_dir = str(tmp_path / "batched")
+
+        with patch.object(builder, '_build_from_records') as mock_build_from_records:
+            await builder.build_dataset(input_path="s3://input-data/records.parquet", output_path=output_dir, read_batch_size=512)
+
+        builder._load_processed_data.assert_awaited_once_with("s3://input-data/records.parquet", batch_size=512)
+        mock_build_from_records.assert_called_once_with(MOCK_RECORDS, output_dir, False, 0.9, None)
+
+    @pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow not installed")
+    async def test_load_processed_data_parquet_batches(self, mock_builder_components, tmp_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        rows = [record.model_dump(mode="json") for record in MOCK_RECORDS]
+        parquet_path = tmp_path / "records.parquet"
+        pq.write_table(pa.Table.from_pylist(rows), parquet_path)
+
+        records = await DatasetBuilder()._load_processed_data(str(parquet_path), batch_size=1)
+        assert [r.step_id for r in records] == [r.step_id for r in MOCK_RECORDS]
 
 MOCK_S3_TEST_BUCKET = "test-builder-s3-bucket"
+# Set VERBOSE_S3_TESTS=1 to get fixture diagnostics printed (kept off to avoid capture overhead)
+_VERBOSE_S3_TESTS = bool(os.environ.get("VERBOSE_S3_TESTS"))
+
+# action.json payloads for the S3 loading test, serialized once at import: (session_id, step_id, record)
+_S3_INPUT_PREFIX = "test_input_data_s3"
+_S3_RAW_ROWS = (
+    ("s3_sessA", "s3_step1", {
+        "step_id": "s3_step1", "session_id": "s3_sessA", "url": "http://s3.example.com/page1", "ts": 1700000100,
+        "action": {"type": "s3_click"}, "screenshot_s3_path": f"s3://{MOCK_S3_TEST_BUCKET}/{_S3_INPUT_PREFIX}/s3_sessA/s3_step1/screen.webp"
+    }),
+    ("s3_sessA", "s3_step2", {
+        "step_id": "s3_step2", "session_id": "s3_sessA", "url": "http://s3.example.com/page2", "ts": 1700000105,
+        "action": {"type": "s3_type", "text": "from s3"}
+    }),
+    ("s3_sessB", "s3_step3_malformed_action", { # Missing 'type' in action
+        "step_id": "s3_step3_malformed_action", "session_id": "s3_sessB", "url": "http://s3.example.com/malformed_action", "ts": 1700000110,
+        "action": {"selector": "#bad"}
+    }),
+    ("s3_sessB", "s3_step4_valid", {
+        "step_id": "s3_step4_valid", "session_id": "s3_sessB", "url": "http://s3.example.com/page4", "ts": 1700000115,
+        "action": {"type": "scroll_s3"}, "obs_html_s3_path": f"s3://{MOCK_S3_TEST_BUCKET}/{_S3_INPUT_PREFIX}/s3_sessB/s3_step4_valid/obs.html.gz"
+    }),
+)
+_S3_MOCK_PAYLOADS = tuple(
+    (f"{_S3_INPUT_PREFIX}/{sess}/{step}/{ACTION_DATA_FILENAME}", orjson.dumps(d))
+    for sess, step, d in _S3_RAW_ROWS
+)
 
-@pytest.fixture(scope="function")
-def aws_credentials():
-    """Mocked AWS Credentials for moto."""
-    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
-    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
-    os.environ["AWS_SECURITY_TOKEN"] = "testing"
-    os.environ["AWS_SESSION_TOKEN"] = "testing"
-    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
-    yield
-    del os.environ["AWS_ACCESS_KEY_ID"]
-    del os.environ["AWS_SECRET_ACCESS_KEY"]
-    del os.environ["AWS_SECURITY_TOKEN"]
-    del os.environ["AWS_SESSION_TOKEN"]
-    del os.environ["AWS_DEFAULT_REGION"]
-
-@pytest.fixture(scope="function")
-def s3_mock(aws_credentials):
-    """Sets up a mock S3 environment for a test function."""
+@pytest.fixture(scope="module")
+def s3_test_bucket(worker_id):
+    """Per-xdist-worker bucket name ("master" when not running distributed), so workers never share a bucket."""
+    return f"{MOCK_S3_TEST_BUCKET}-{worker_id}"
+
+# The moto backend, client and bucket are created once per module rather than per test (credentials come
+# from the session-wide aws_credentials fixture in conftest.py).
+# Module (not session) scope keeps this mock_aws context from leaking into other test modules, whose own
+# mock_aws() entries would reset the shared backend anyway.
+@pytest.fixture(scope="module")
+def s3_mock(aws_credentials, s3_test_bucket):
+    """Sets up a mock S3 environment shared by the S3 tests in this module."""
     with mock_aws():
         s3 = boto3.client("s3", region_name="us-east-1")
         try:
-            s3.create_bucket(Bucket=MOCK_S3_TEST_BUCKET)
-            print(f"Mock S3 bucket '{MOCK_S3_TEST_BUCKET}' created for test function.")
+            s3.create_bucket(Bucket=s3_test_bucket)
+            if _VERBOSE_S3_TESTS:
+                print(f"Mock S3 bucket '{s3_test_bucket}' created for test module.")
         except ClientError as e:
-            if e.response['Error']['Code'] == 'BucketAlreadyOwnedByYou':
-                print(f"Mock S3 bucket '{MOCK_S3_TEST_BUCKET}' already exists for test function.")
-            else:
+            if e.response['Error']['Code'] != 'BucketAlreadyOwnedByYou':
                 raise
         yield s3 # Provides the s3 client to the test
 
-@pytest.fixture
-def s3_storage_manager(s3_mock): # Depends on s3_mock to ensure moto is active and bucket exists
+@pytest.fixture(autouse=True)
+def s3_cleanup(request):
+    """Empties the shared mock bucket after each test that used it, so tests don't see each other's objects."""
+    yield
+    if "s3_mock" not in request.fixturenames:
+        return # Test never touched S3; don't spin up moto just to clean up
+    s3 = request.getfixturevalue("s3_mock")
+    bucket = request.getfixturevalue("s3_test_bucket")
+    keys = [obj["Key"] for obj in s3.list_objects_v2(Bucket=bucket).get("Contents", [])]
+    if keys:
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in keys]})
+
+@pytest.fixture(scope="module")
+def s3_storage_manager(s3_mock, s3_test_bucket): # Depends on s3_mock to ensure moto is active and bucket exists
     """Provides a StorageManager instance configured for S3 integration tests."""
     # s3_mock ensures that boto3.client will use the mock S3
     manager = StorageManager(
-        s3_bucket_name=MOCK_S3_TEST_BUCKET,
+        s3_bucket_name=s3_test_bucket,
         s3_region_name="us-east-1", # Match aws_credentials
         prefer_s3=True
     )
@@ -265,42 +347,84 @@ def s3_dataset_builder(s3_storage_manager) -> DatasetBuilder:
     # Pass the S3-enabled storage_manager to the builder
     return DatasetBuilder(storage_manager=s3_storage_manager)
 
+@pytest.fixture(scope="module")
+def sample_input_dir(tmp_path_factory):
+    """Local input directory for the loader tests; written once per module since tests only read it."""
+    sample_input_dir = tmp_path_factory.mktemp("sample_input_data")
+
+    record1_data = {
+        "step_id": "load_step1", "session_id": "s_load", "url": "http://example.com/load1", "ts": 123,
+        "action": {"type": "load_click"}, "screenshot_s3_path": "s3://bucket/load1.webp"
+    }
+    record2_data = {
+        "step_id": "load_step2", "session_id": "s_load", "url": "http://example.com/load2", "ts": 124,
+        "action": {"type": "load_type", "text": "test"}
+        # No screenshot_s3_path
+    }
+    # Malformed record
+    record3_malformed = {
+        "step_id": "load_step3", "url": "not_a_valid_url", "ts": "not_an_int",
+        "action": {}
+    }
+
+    # File 1 with valid records
+    (sample_input_dir / "data1.json").write_bytes(orjson.dumps([record1_data, record2_data]))
+
+    # File 2 with one valid and one malformed record
+    record_valid_in_file2 = {
+        "step_id": "load_step4", "session_id": "s_load_f2", "url": "http://example.com/load4", "ts": 125,
+        "action": {"type": "scroll"}, "obs_html_s3_path": "s3://bucket/html/load4.html.gz"
+    }
+    (sample_input_dir / "data2.json").write_bytes(orjson.dumps([record_valid_in_file2, record3_malformed]))
+
+    # File 3 not a list
+    (sample_input_dir / "data3.json").write_bytes(orjson.dumps({"not_a": "list"}))
+    
+    # File 4 invalid json
+    (sample_input_dir / "data4.json").write_text("this is not json")
+    
+    # Non-json file to be ignored
+    (sample_input_dir / "data.txt").write_text("ignore me")
+    return sample_input_dir
+
 class TestDatasetBuilderIntegration:
+    # Tests only share read-only fixtures and write under their own tmp_path, so xdist may run them on any worker
     @pytest.fixture
     def integration_builder(self) -> DatasetBuilder:
-        return DatasetBuilder(config={})
+        builder = DatasetBuilder(config={})
+        builder.splitter = DataSplitter(random_seed=42) # Constant seed keeps splits identical across workers
+        return builder
 
-    @pytest.fixture
+    @pytest.fixture(scope="module") # Validated once; tests only read these records
     def sample_records_for_integration(self) -> list[ProcessedDataRecord]:
-        return [
-            ProcessedDataRecord(
-                step_id="integ_step1", session_id="integ_sess_A", ts=1700000000, 
-                action=ActionDetail(type="click", selector="#button-shop"), 
-                url="http://shop.example.com/home",
-                obs_html_s3_path="s3://integ-bucket/html/s1.html.gz",
-                screenshot_s3_path="s3://integ-bucket/imgs/s1.webp"
-            ),
-            ProcessedDataRecord(
-                step_id="integ_step2", session_id="integ_sess_A", ts=1700000005, 
-                action=ActionDetail(type="type", selector="#search", text="gadget"), 
-                url="http://shop.example.com/search?q=gadget",
-                obs_html_s3_path="s3://integ-bucket/html/s2.html.gz",
-                screenshot_s3_path=None
-            ),
-             ProcessedDataRecord(
-                step_id="integ_step3", session_id="integ_sess_B", ts=1700000010, 
-                action=ActionDetail(type="click", selector="#login-link"), 
-                url="http://auth.example.com/login",
-                obs_html_s3_path="s3://integ-bucket/html/s3.html.gz",
-                screenshot_s3_path="s3://integ-bucket/imgs/s3.webp"
-            )
-        ]
+        return _ADAPTER.validate_python([
+            {
+                "step_id": "integ_step1", "session_id": "integ_sess_A", "ts": 1700000000,
+                "action": {"type": "click", "selector": "#button-shop"},
+                "url": "http://shop.example.com/home",
+                "obs_html_s3_path": "s3://integ-bucket/html/s1.html.gz",
+                "screenshot_s3_path": "s3://integ-bucket/imgs/s1.webp",
+            },
+            {
+                "step_id": "integ_step2", "session_id": "integ_sess_A", "ts": 1700000005,
+                "action": {"type": "type", "selector": "#search", "text": "gadget"},
+                "url": "http://shop.example.com/search?q=gadget",
+                "obs_html_s3_path": "s3://integ-bucket/html/s2.html.gz",
+                "screenshot_s3_path": None,
+            },
+            {
+                "step_id": "integ_step3", "session_id": "integ_sess_B", "ts": 1700000010,
+                "action": {"type": "click", "selector": "#login-link"},
+                "url": "http://auth.example.com/login",
+                "obs_html_s3_path": "s3://integ-bucket/html/s3.html.gz",
+                "screenshot_s3_path": "s3://integ-bucket/imgs/s3.webp",
+            },
+        ])
 
     @pytest.mark.asyncio # All tests in this class are now async due to build_dataset
     async def test_build_dataset_basic_flow(self, integration_builder: DatasetBuilder, sample_records_for_integration: list[ProcessedDataRecord], tmp_path):
         output_dir = tmp_path / "integration_output_basic"
-        integration_builder._load_processed_data = MagicMock()
-        integration_builder._load_processed_data.return_value = sample_records_for_integration
+        integration_builder._load_processed_data = AsyncMock(return_value=sample_records_for_integration)
 
         await integration_builder.build_dataset(
             input_path="dummy_input_path",
@@ -310,27 +434,24 @@ class TestDatasetBuilderIntegration:
             filter_options=None
         )
 
-        train_jsonl_path = output_dir / "train.jsonl"
-        stats_json_path = output_dir / "dataset_stats.json"
+        train_jsonl_path = output_dir / TRAIN_JSONL
+        stats_json_path = output_dir / STATS_JSON
 
-        assert train_jsonl_path.exists()
-        assert stats_json_path.exists()
-        assert not (output_dir / "validation.jsonl").exists()
+        names = _ls(output_dir)
+        assert TRAIN_JSONL in names
+        assert STATS_JSON in names
+        assert VAL_JSONL not in names
 
-        train_lines = []
-        with open(train_jsonl_path, 'r') as f:
-            for line in f: train_lines.append(json.loads(line))
+        train_lines = [orjson.loads(l) for l in train_jsonl_path.read_bytes().splitlines() if l]
         assert len(train_lines) == len(sample_records_for_integration)
 
-        with open(stats_json_path, 'r') as f:
-            stats_data = json.load(f)
+        stats_data = orjson.loads(stats_json_path.read_bytes())
         assert stats_data["total_records"] == len(sample_records_for_integration)
 
     @pytest.mark.asyncio
     async def test_build_dataset_with_train_val_split(self, integration_builder: DatasetBuilder, sample_records_for_integration: list[ProcessedDataRecord], tmp_path):
         output_dir = tmp_path / "integration_output_split"
-        integration_builder._load_processed_data = MagicMock()
-        integration_builder._load_processed_data.return_value = sample_records_for_integration
+        integration_builder._load_processed_data = AsyncMock(return_value=sample_records_for_integration)
 
         train_ratio = 0.6
         num_total = len(sample_records_for_integration)
@@ -345,15 +466,13 @@ class TestDatasetBuilderIntegration:
             train_split=train_ratio_for_2_1_split 
         )
 
-        train_jsonl_path = output_dir / "train.jsonl"
-        val_jsonl_path = output_dir / "validation.jsonl"
+        train_jsonl_path = output_dir / TRAIN_JSONL
+        val_jsonl_path = output_dir / VAL_JSONL
         assert train_jsonl_path.exists()
         assert val_jsonl_path.exists()
 
-        with open(train_jsonl_path, 'r') as f:
-            train_lines = [json.loads(line) for line in f]
-        with open(val_jsonl_path, 'r') as f:
-            val_lines = [json.loads(line) for line in f]
+        train_lines = [orjson.loads(l) for l in train_jsonl_path.read_bytes().splitlines() if l]
+        val_lines = [orjson.loads(l) for l in val_jsonl_path.read_bytes().splitlines() if l]
         
         assert len(train_lines) == num_train_expected
         assert len(val_lines) == num_val_expected
@@ -361,8 +480,7 @@ class TestDatasetBuilderIntegration:
     @pytest.mark.asyncio
     async def test_build_dataset_with_filtering(self, integration_builder: DatasetBuilder, sample_records_for_integration: list[ProcessedDataRecord], tmp_path):
         output_dir = tmp_path / "integration_output_filter"
-        integration_builder._load_processed_data = MagicMock()
-        integration_builder._load_processed_data.return_value = sample_records_for_integration
+        integration_builder._load_processed_data = AsyncMock(return_value=sample_records_for_integration)
         
         filter_opts = {"domain_allowlist": ["shop.example.com"]}
 
@@ -373,10 +491,9 @@ class TestDatasetBuilderIntegration:
             filter_options=filter_opts
         )
         
-        train_jsonl_path = output_dir / "train.jsonl"
+        train_jsonl_path = output_dir / TRAIN_JSONL
         assert train_jsonl_path.exists()
-        with open(train_jsonl_path, 'r') as f:
-            train_lines = [json.loads(line) for line in f]
+        train_lines = [orjson.loads(l) for l in train_jsonl_path.read_bytes().splitlines() if l]
         
         assert len(train_lines) == 2 
         for record_output in train_lines:
@@ -399,8 +516,7 @@ class TestDatasetBuilderIntegration:
             screenshot_s3_path=None
         )
         records = [record_with_image, record_no_image]
-        integration_builder._load_processed_data = MagicMock()
-        integration_builder._load_processed_data.return_value = records
+        integration_builder._load_processed_data = AsyncMock(return_value=records)
         
         actual_formatter = integration_builder.formatter
         
@@ -411,9 +527,9 @@ class TestDatasetBuilderIntegration:
                 include_images=True, 
                 train_split=1.0 
             )
-            mock_write_method.assert_any_call(
+            mock_write_method.assert_called_with(
                 records, 
-                os.path.join(str(mock_output_dir), "train.jsonl"),
+                os.path.join(str(mock_output_dir), TRAIN_JSONL),
                 True 
             )
 
@@ -424,57 +540,16 @@ class TestDatasetBuilderIntegration:
                 include_images=False, 
                 train_split=1.0
             )
-            mock_write_method.assert_any_call(
+            mock_write_method.assert_called_with(
                 records,
-                os.path.join(str(mock_output_dir / "subdir"), "train.jsonl"),
+                os.path.join(str(mock_output_dir / "subdir"), TRAIN_JSONL),
                 False 
             )
 
-    def test_load_processed_data_local_files(self, integration_builder: DatasetBuilder, tmp_path):
+    @pytest.mark.asyncio
+    async def test_load_processed_data_local_files(self, integration_builder: DatasetBuilder, sample_input_dir):
         """Tests the _load_processed_data method with local JSON files."""
-        sample_input_dir = tmp_path / "sample_input_data"
-        sample_input_dir.mkdir()
-
-        record1_data = {
-            "step_id": "load_step1", "session_id": "s_load", "url": "http://example.com/load1", "ts": 123,
-            "action": {"type": "load_click"}, "screenshot_s3_path": "s3://bucket/load1.webp"
-        }
-        record2_data = {
-            "step_id": "load_step2", "session_id": "s_load", "url": "http://example.com/load2", "ts": 124,
-            "action": {"type": "load_type", "text": "test"}
-            # No screenshot_s3_path
-        }
-        # Malformed record
-        record3_malformed = {
-            "step_id": "load_step3", "url": "not_a_valid_url", "ts": "not_an_int",
-            "action": {}
-        }
-
-        # File 1 with valid records
-        with open(sample_input_dir / "data1.json", "w") as f:
-            json.dump([record1_data, record2_data], f)
-
-        # File 2 with one valid and one malformed record
-        record_valid_in_file2 = {
-            "step_id": "load_step4", "session_id": "s_load_f2", "url": "http://example.com/load4", "ts": 125,
-            "action": {"type": "scroll"}, "obs_html_s3_path": "s3://bucket/html/load4.html.gz"
-        }
-        with open(sample_input_dir / "data2.json", "w") as f:
-            json.dump([record_valid_in_file2, record3_malformed], f)
-
-        # File 3 not a list
-        with open(sample_input_dir / "data3.json", "w") as f:
-            json.dump({"not_a": "list"}, f)
-        
-        # File 4 invalid json
-        with open(sample_input_dir / "data4.json", "w") as f:
-            f.write("this is not json")
-        
-        # Non-json file to be ignored
-        with open(sample_input_dir / "data.txt", "w") as f:
-            f.write("ignore me")
-
-        loaded_records = integration_builder._load_processed_data(str(sample_input_dir))
+        loaded_records = await integration_builder._load_processed_data(str(sample_input_dir))
         
         assert len(loaded_records) == 3 # record1_data, record2_data, record_valid_in_file2
         step_ids_loaded = {r.step_id for r in loaded_records}
@@ -483,17 +558,18 @@ class TestDatasetBuilderIntegration:
         assert "load_step4" in step_ids_loaded
 
         # Test with a non-existent directory
-        non_existent_dir = tmp_path / "non_existent"
-        loaded_non_existent = integration_builder._load_processed_data(str(non_existent_dir))
+        non_existent_dir = sample_input_dir.parent / "non_existent"
+        loaded_non_existent = await integration_builder._load_processed_data(str(non_existent_dir))
         assert len(loaded_non_existent) == 0
 
         # Test with a file path instead of a directory
         file_instead_of_dir = sample_input_dir / "data1.json"
-        loaded_file_path = integration_builder._load_processed_data(str(file_instead_of_dir))
+        loaded_file_path = await integration_builder._load_processed_data(str(file_instead_of_dir))
         assert len(loaded_file_path) == 0
 
     @pytest.mark.asyncio
-    async def test_load_processed_data_from_s3(self, s3_dataset_builder: DatasetBuilder, s3_mock):
+    @pytest.mark.s3
+    async def test_load_processed_data_from_s3(self, s3_dataset_builder: DatasetBuilder, s3_mock, s3_test_bucket):
         """Tests loading ProcessedDataRecord objects from S3 via _load_processed_data."""
         builder = s3_dataset_builder
         sm = builder.storage_manager
@@ -501,39 +577,18 @@ class TestDatasetBuilderIntegration:
         assert sm.use_s3, "StorageManager in s3_dataset_builder is not configured for S3"
         
         bucket_name = sm.s3_bucket_name
-        assert bucket_name == MOCK_S3_TEST_BUCKET, "S3 bucket name mismatch"
-
-        s3_base_prefix = "test_input_data_s3"
-
-        # Prepare some mock data to upload to S3
-        record_s3_1_data = {
-            "step_id": "s3_step1", "session_id": "s3_sessA", "url": "http://s3.example.com/page1", "ts": 1700000100,
-            "action": {"type": "s3_click"}, "screenshot_s3_path": f"s3://{bucket_name}/{s3_base_prefix}/s3_sessA/s3_step1/screen.webp"
-        }
-        record_s3_2_data = {
-            "step_id": "s3_step2", "session_id": "s3_sessA", "url": "http://s3.example.com/page2", "ts": 1700000105,
-            "action": {"type": "s3_type", "text": "from s3"}
-        }
-        record_s3_3_data_malformed_action = { # Missing 'type' in action
-            "step_id": "s3_step3_malformed_action", "session_id": "s3_sessB", "url": "http://s3.example.com/malformed_action", "ts": 1700000110,
-            "action": {"selector": "#bad"} 
-        }
-        record_s3_4_valid_other_session = {
-            "step_id": "s3_step4_valid", "session_id": "s3_sessB", "url": "http://s3.example.com/page4", "ts": 1700000115,
-            "action": {"type": "scroll_s3"}, "obs_html_s3_path": f"s3://{bucket_name}/{s3_base_prefix}/s3_sessB/s3_step4_valid/obs.html.gz"
-        }
-
-        # Upload these as action.json files to mock S3 structure
-        s3_paths_to_upload = [
-            (f"{s3_base_prefix}/s3_sessA/s3_step1/{ACTION_DATA_FILENAME}", record_s3_1_data),
-            (f"{s3_base_prefix}/s3_sessA/s3_step2/{ACTION_DATA_FILENAME}", record_s3_2_data),
-            (f"{s3_base_prefix}/s3_sessB/s3_step3_malformed_action/{ACTION_DATA_FILENAME}", record_s3_3_data_malformed_action),
-            (f"{s3_base_prefix}/s3_sessB/s3_step4_valid/{ACTION_DATA_FILENAME}", record_s3_4_valid_other_session),
-        ]
-
-        for s3_key, data_dict in s3_paths_to_upload:
-            s3_mock.put_object(Bucket=bucket_name, Key=s3_key, Body=json.dumps(data_dict).encode('utf-8'))
-            print(f"Uploaded mock data to s3://{bucket_name}/{s3_key}")
+        assert bucket_name == s3_test_bucket, "S3 bucket name mismatch"
+
+        s3_base_prefix = _S3_INPUT_PREFIX
+
+        # Upload the pre-serialized action.json payloads to the mock S3 structure
+        def _upload(key_and_body):
+            s3_key, body = key_and_body
+            s3_mock.put_object(Bucket=bucket_name, Key=s3_key, Body=body)
+
+        # boto3 clients are thread-safe; uploading concurrently overlaps the per-request marshalling/round trips
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(_upload, _S3_MOCK_PAYLOADS))
 
         # Add a file that is not ACTION_DATA_FILENAME to ensure it's ignored by the listing logic if it were to list all files
         s3_mock.put_object(Bucket=bucket_name, Key=f"{s3_base_prefix}/s3_sessA/s3_step1/other_file.txt", Body="ignore_me")
@@ -570,6 +625,7 @@ class TestDatasetBuilderIntegration:
         # The current implementation of _load_processed_data_from_s3 logs warnings for failed downloads/parses.
 
     @pytest.mark.asyncio
+    @pytest.mark.s3
     async def test_build_dataset_s3_output(self, s3_dataset_builder: DatasetBuilder, s3_mock, sample_records_for_integration):
         """Tests build_dataset writing output to S3."""
         builder = s3_dataset_builder
@@ -580,8 +636,7 @@ class TestDatasetBuilderIntegration:
         s3_output_uri = f"s3://{bucket_name}/{s3_output_prefix}"
 
         # Mock _load_processed_data to provide consistent input
-        builder._load_processed_data = MagicMock()
-        builder._load_processed_data.return_value = sample_records_for_integration # Use the existing sample records
+        builder._load_processed_data = AsyncMock(return_value=sample_records_for_integration) # Use the existing sample records
 
         # Run build_dataset with S3 output path
         await builder.build_dataset(
@@ -592,40 +647,37 @@ class TestDatasetBuilderIntegration:
         )
 
         # Verify files were written to S3
-        expected_train_key = f"{s3_output_prefix}/train.jsonl".strip("/")
-        expected_val_key = f"{s3_output_prefix}/validation.jsonl".strip("/")
-        expected_stats_key = f"{s3_output_prefix}/dataset_stats.json".strip("/")
+        expected_train_key = f"{s3_output_prefix}/{TRAIN_JSONL}".strip("/")
+        expected_val_key = f"{s3_output_prefix}/{VAL_JSONL}".strip("/")
+        expected_stats_key = f"{s3_output_prefix}/{STATS_JSON}".strip("/")
+
+        # One listing confirms all three outputs exist; then fetch them concurrently
+        resp = s3_mock.list_objects_v2(Bucket=bucket_name, Prefix=s3_output_prefix)
+        keys = {o['Key'] for o in resp.get('Contents', [])}
+        assert {expected_train_key, expected_val_key, expected_stats_key} <= keys
+
+        def _fetch(key):
+            return key, s3_mock.get_object(Bucket=bucket_name, Key=key)['Body'].read()
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            contents = dict(executor.map(_fetch, [expected_train_key, expected_val_key, expected_stats_key]))
 
         # Check train.jsonl
-        try:
-            train_obj = s3_mock.get_object(Bucket=bucket_name, Key=expected_train_key)
-            train_content = train_obj['Body'].read().decode('utf-8')
-            train_lines = [json.loads(line) for line in train_content.strip().split('\n')]
-            assert len(train_lines) == 2 # Based on 3 records and ~0.67 split
-        except ClientError as e:
-            pytest.fail(f"Failed to get train.jsonl from S3: {e}")
+        train_lines = [orjson.loads(l) for l in contents[expected_train_key].splitlines() if l]
+        assert len(train_lines) == 2 # Based on 3 records and ~0.67 split
 
         # Check validation.jsonl
-        try:
-            val_obj = s3_mock.get_object(Bucket=bucket_name, Key=expected_val_key)
-            val_content = val_obj['Body'].read().decode('utf-8')
-            val_lines = [json.loads(line) for line in val_content.strip().split('\n')]
-            assert len(val_lines) == 1
-        except ClientError as e:
-            pytest.fail(f"Failed to get validation.jsonl from S3: {e}")
+        val_lines = [orjson.loads(l) for l in contents[expected_val_key].splitlines() if l]
+        assert len(val_lines) == 1
 
         # Check dataset_stats.json
-        try:
-            stats_obj = s3_mock.get_object(Bucket=bucket_name, Key=expected_stats_key)
-            stats_content = json.loads(stats_obj['Body'].read().decode('utf-8'))
-            assert stats_content["total_records"] == len(sample_records_for_integration)
-            # Add more assertions for stats content if needed
-        except ClientError as e:
-            pytest.fail(f"Failed to get dataset_stats.json from S3: {e}")
+        stats_content = orjson.loads(contents[expected_stats_key])
+        assert stats_content["total_records"] == len(sample_records_for_integration)
+        # Add more assertions for stats content if needed
 
         # Test case: S3 output but StorageManager not configured for S3 (should log error and not write)
         builder_no_s3_sm = DatasetBuilder() # Uses default SM, likely local
-        builder_no_s3_sm._load_processed_data = MagicMock(return_value=sample_records_for_integration)
+        builder_no_s3_sm._load_processed_data = AsyncMock(return_value=sample_records_for_integration)
         
         s3_output_uri_fail = f"s3://another-bucket/output_fail"
         # Clear S3 mock before this call to ensure no objects are written if it tries
@@ -644,7 +696,7 @@ class TestDatasetBuilderIntegration:
             mock_upload_fail_sm.assert_not_called() # Ensure no S3 upload was attempted
 
         # Test case: S3 upload fails during write
-        builder._load_processed_data = MagicMock(return_value=sample_records_for_integration)
+        builder._load_processed_data = AsyncMock(return_value=sample_records_for_integration)
         with patch.object(builder.storage_manager, '_upload_to_s3', side_effect=S3OperationError("Simulated S3 Upload Error")):
             # Expect it to log errors, but not necessarily raise the S3OperationError from build_dataset directly,
             # as build_dataset might catch and log it.
@@ -4,21 +4,31 @@ Tests for dataset filtering utilities.
 import pytest
 import re
 from pydantic import HttpUrl
-from typing import List
+from typing import Tuple
 
 from src.dataset_builder.filtering import DataFilterer, FilteringError, FilterCallable
 from src.dataset_builder.types import ProcessedDataRecord, ActionDetail
 
-@pytest.fixture
-def sample_records() -> List[ProcessedDataRecord]:
-    # Ensure URLs are valid HttpUrl for Pydantic model instantiation
-    return [
-        ProcessedDataRecord(step_id='s1', session_id='sess1', url=HttpUrl('https://example.com/page1'), ts=1, action=ActionDetail(type='click'), html_content='Hello example <p>world</p>'),
-        ProcessedDataRecord(step_id='s2', session_id='sess1', url=HttpUrl('http://test.com/another/item'), ts=2, action=ActionDetail(type='input', text='test data'), html_content='Test input field here'),
-        ProcessedDataRecord(step_id='s3', session_id='sess2', url=HttpUrl('https://example.com/other_page'), ts=3, action=ActionDetail(type='click', selector='#btn'), html_content='Another example page content'),
-        ProcessedDataRecord(step_id='s4', session_id='sess2', url=HttpUrl('https://sub.example.com/product/1'), ts=4, action=ActionDetail(type='scroll'), html_content=None), # No HTML
-        ProcessedDataRecord(step_id='s5', session_id='sess3', url=HttpUrl('http://data.test.net/path'), ts=5, action=ActionDetail(type='navigate'), html_content='Simple content on test.net'),
-    ]
+# Parsed once at import; the fixture reuses these HttpUrl objects instead of re-parsing them
+_URLS = tuple(HttpUrl(u) for u in (
+    'https://example.com/page1',
+    'http://test.com/another/item',
+    'https://example.com/other_page',
+    'https://sub.example.com/product/1',
+    'http://data.test.net/path',
+))
+
+@pytest.fixture(scope="module")
+def sample_records() -> Tuple[ProcessedDataRecord, ...]:
+    # Built once per module; a tuple so no test can mutate the shared records list.
+    # The values are known-valid, so model_construct skips re-running validation.
+    return (
+        ProcessedDataRecord.model_construct(step_id='s1', session_id='sess1', url=_URLS[0], ts=1, action=ActionDetail.model_construct(type='click'), html_content='Hello example <p>world</p>'),
+        ProcessedDataRecord.model_construct(step_id='s2', session_id='sess1', url=_URLS[1], ts=2, action=ActionDetail.model_construct(type='input', text='test data'), html_content='Test input field here'),
+        ProcessedDataRecord.model_construct(step_id='s3', session_id='sess2', url=_URLS[2], ts=3, action=ActionDetail.model_construct(type='click', selector='#btn'), html_content='Another example page content'),
+        ProcessedDataRecord.model_construct(step_id='s4', session_id='sess2', url=_URLS[3], ts=4, action=ActionDetail.model_construct(type='scroll'), html_content=None), # No HTML
+        ProcessedDataRecord.model_construct(step_id='s5', session_id='sess3', url=_URLS[4], ts=5, action=ActionDetail.model_construct(type='navigate'), html_content='Simple content on test.net'),
+    )
 
 class TestDataFilterer:
     def test_init_no_filters(self):
@@ -71,6 +81,13 @@ class TestDataFilterer:
         assert len(filtered) == 2 # s1, s3 (s4 excluded due to subdomain)
         assert all(r.step_id in ['s1', 's3'] for r in filtered)
 
+    def test_filter_by_url_domain_matches_whole_labels(self, sample_records):
+        lookalike = ProcessedDataRecord(step_id='s6', session_id='sess4', url=HttpUrl('https://notexample.com:8443/x'), ts=6, action=ActionDetail(type='click'))
+        filterer = DataFilterer()
+        filterer.add_filter_by_url_domain(domains_to_keep=['EXAMPLE.com'])
+        filtered = filterer.filter_records([*sample_records, lookalike])
+        assert [r.step_id for r in filtered] == ['s1', 's3', 's4'] # notexample.com is not a subdomain
+
     def test_filter_by_url_domain_no_criteria_raises_error(self):
         filterer = DataFilterer()
         with pytest.raises(FilteringError, match="Must provide either domains_to_keep or domains_to_exclude"):
@@ -139,7 +156,7 @@ class TestDataFilterer:
         assert len(filtered) == 1 # Only s1 matches all: example.com, click, and contains "world"
         assert filtered[0].step_id == 's1'
 
-    def test_filter_function_raises_error(self, sample_records, capsys):
+    def test_filter_function_raises_error(self, sample_records, caplog):
         filterer = DataFilterer()
         def error_filter(record: ProcessedDataRecord) -> bool:
             if record.step_id == 's2':
@@ -150,9 +167,75 @@ class TestDataFilterer:
         # s2 should be excluded due to the error
         assert len(filtered) == len(sample_records) - 1 
         assert 's2' not in [r.step_id for r in filtered]
-        captured = capsys.readouterr()
-        assert "Warning: Filter function error_filter raised an error on record s2" in captured.out
-        assert "Intentional error for testing" in captured.out
+        assert "Filter function error_filter raised an error on record s2" in caplog.text
+        assert "Intentional error for testing" in caplog.text
+        assert all(r.levelname == "WARNING" for r in caplog.records)
+
+    def test_stacked_html_regex_filters_scan_once(self, sample_records, mocker):
+        filterer = DataFilterer()
+        filterer.add_filter_by_html_content_regex(r"example", present=True)
+        filterer.add_filter_by_html_content_regex(re.compile(r"WORLD", re.IGNORECASE), present=False)
+        scan_spy = mocker.spy(filterer._html_regex_bank, "scan")
+        filterer._column_extractors["html_regex"] = filterer._html_regex_bank.scan # Route through the spy
+        filtered = filterer.filter_records(sample_records)
+        assert [r.step_id for r in filtered] == ['s3'] # s1 contains "world", s4 has no HTML
+        assert scan_spy.call_count == 1
+
+    def test_html_regex_bank_combined_alternation(self, sample_records):
+        filterer = DataFilterer()
+        # "exam" only ever matches inside "example", which the first branch consumes
+        filterer.add_filter_by_html_content_regex(r"example", present=True)
+        filterer.add_filter_by_html_content_regex(r"exam", present=True)
+        filterer.add_filter_by_html_content_regex(re.compile(r"PAGE", re.IGNORECASE), present=True)
+        filtered = filterer.filter_records(sample_records)
+        assert filterer._html_regex_bank._combined is not None
+        assert [r.step_id for r in filtered] == ['s3']
+
+    def test_html_regex_bank_backreference_not_combined(self, sample_records):
+        filterer = DataFilterer()
+        filterer.add_filter_by_html_content_regex(r"(e)xampl\1", present=True)
+        filterer.add_filter_by_html_content_regex(r"world", present=False)
+        filtered = filterer.filter_records(sample_records)
+        assert filterer._html_regex_bank._combined is None # Falls back to one search per pattern
+        assert [r.step_id for r in filtered] == ['s3']
+
+    def test_filter_records_bulk_with_custom_filter(self, sample_records):
+        filterer = DataFilterer()
+        filterer.add_filter_by_url_domain(domains_to_keep=['example.com'])
+        filterer.add_filter_by_action_type(action_types_to_exclude=['scroll'])
+        filterer.add_filter(lambda r: r.step_id != 's3') # Custom callables run after the built-in masks
+        filtered = filterer.filter_records_bulk(sample_records)
+        assert [r.step_id for r in filtered] == ['s1']
+        assert filterer.filter_records(sample_records) == filtered
+
+    def test_filter_records_parallel_matches_sequential(self, sample_records):
+        many_records = sample_records * 20
+        filterer = DataFilterer()
+        filterer.add_filter_by_url_domain(domains_to_keep=['example.com'])
+        filterer.add_filter_by_html_content_regex(r"example", present=True)
+        parallel = filterer._filter_records_parallel(many_records, workers=2, chunk_size=16)
+        assert parallel == filterer.filter_records(many_records, workers=1)
+        assert [r.step_id for r in parallel] == ['s1', 's3'] * 20
+
+    @pytest.mark.parametrize("workers", [None, 0, 1])
+    def test_filter_records_is_sequential_unless_workers_requested(self, sample_records, mocker, workers):
+        mocker.patch("src.dataset_builder.filtering.PARALLEL_FILTER_MIN_RECORDS", 1)
+        parallel_spy = mocker.spy(DataFilterer, "_filter_records_parallel")
+        filterer = DataFilterer()
+        filterer.add_filter_by_action_type(action_types_to_keep=['click'])
+        kwargs = {} if workers is None else {"workers": workers}
+        filtered = filterer.filter_records(sample_records, chunk_size=1, **kwargs)
+        assert [r.step_id for r in filtered] == ['s1', 's3']
+        parallel_spy.assert_not_called()
+
+    def test_filter_records_stays_in_process_for_unpicklable_filters(self, sample_records, mocker):
+        mocker.patch("src.dataset_builder.filtering.PARALLEL_FILTER_MIN_RECORDS", 1)
+        parallel_spy = mocker.spy(DataFilterer, "_filter_records_parallel")
+        filterer = DataFilterer()
+        filterer.add_filter(lambda r: r.action.type == 'click') # Lambdas cannot be pickled
+        filtered = filterer.filter_records(sample_records, workers=2, chunk_size=1)
+        assert [r.step_id for r in filtered] == ['s1', 's3']
+        parallel_spy.assert_not_called()
 
     def test_empty_input_records(self):
         filterer = DataFilterer()
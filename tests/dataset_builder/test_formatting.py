@@ -3,26 +3,33 @@ Tests for dataset formatting utilities.
 '''
 import pytest
 import json
+from types import MappingProxyType
+from urllib.parse import urlparse
 from pydantic import HttpUrl
 
 from src.dataset_builder.formatting import (
     create_processed_data_record,
     serialize_record_to_jsonl,
     format_for_llm_prompt_completion,
-    DataFormattingError
+    DataFormattingError,
+    JsonlFormatter
 )
+from src.dataset_builder.image_handler import ImageHandler
+from src.dataset_builder import formatting
 from src.dataset_builder.types import ProcessedDataRecord, ActionDetail, RawStagehandAction
 
-@pytest.fixture
+# The fixtures below are module-scoped (built once) and read-only: tests that need to
+# change a value copy first, e.g. params = valid_record_params.copy().
+@pytest.fixture(scope="module")
 def sample_raw_action_data() -> RawStagehandAction:
-    return {
+    return MappingProxyType({
         "type": "click",
         "selector": "#submit-button",
         "text": "Submit",
         "stagehand_metadata": {"element_is_visible": True, "confidence_score": 0.95}
-    }
+    })
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_action_detail() -> ActionDetail:
     return ActionDetail(
         type="input",
@@ -31,9 +38,9 @@ def sample_action_detail() -> ActionDetail:
         stagehand_metadata={"source": "human-annotated"}
     )
 
-@pytest.fixture
-def valid_record_params(sample_raw_action_data) -> dict:
-    return {
+@pytest.fixture(scope="module")
+def valid_record_params(sample_raw_action_data) -> MappingProxyType:
+    return MappingProxyType({
         "step_id": "test_step_001",
         "session_id": "test_session_abc",
         "url": "https://example.com/page1",
@@ -43,7 +50,7 @@ def valid_record_params(sample_raw_action_data) -> dict:
         "screenshot_s3_path": "s3://my-bucket/screenshots/step001.webp",
         "html_content": "<html><body><p>Test HTML content</p></body></html>",
         "stagehand_task_id": "task_12345"
-    }
+    })
 
 class TestDataFormatting:
     def test_create_processed_data_record_success(self, valid_record_params):
@@ -101,6 +108,19 @@ class TestDataFormatting:
              create_processed_data_record(**params)
         assert "Could not parse action_data into ActionDetail" in str(exc_info.value) 
         
+    def test_url_str_matches_url_and_not_serialized(self, valid_record_params):
+        record = create_processed_data_record(**valid_record_params)
+        assert record.url_str == str(record.url)
+        assert "url_str" not in json.loads(serialize_record_to_jsonl(record))
+        assert record == create_processed_data_record(**valid_record_params)
+
+    def test_url_str_follows_model_copy_url_update(self, valid_record_params):
+        record = create_processed_data_record(**valid_record_params)
+        assert record.url_str == str(record.url) # Read once before copying
+        copied = record.model_copy(update={"url": HttpUrl("http://other.com/page")})
+        assert copied.url_str == "http://other.com/page"
+        assert urlparse(copied.url_str).hostname == "other.com"
+
     def test_serialize_record_to_jsonl_success(self, valid_record_params):
         record = create_processed_data_record(**valid_record_params)
         jsonl_string = serialize_record_to_jsonl(record)
@@ -134,6 +154,17 @@ class TestDataFormatting:
         assert "stagehand_task_id" not in data
         assert data["step_id"] == params["step_id"]
         
+    @pytest.mark.parametrize("msgspec_on, orjson_on", [(True, True), (False, True), (False, False)])
+    def test_serialize_record_matches_pydantic(self, valid_record_params, monkeypatch, msgspec_on, orjson_on):
+        # Every encoder backend must produce exactly what Pydantic's model_dump_json would
+        monkeypatch.setattr("src.dataset_builder.formatting.MSGSPEC_AVAILABLE", msgspec_on and formatting.MSGSPEC_AVAILABLE)
+        monkeypatch.setattr("src.dataset_builder.formatting.ORJSON_AVAILABLE", orjson_on and formatting.ORJSON_AVAILABLE)
+        params = valid_record_params.copy()
+        params["stagehand_task_id"] = None
+        params["html_content"] = "<p>caf\u00e9</p>" # Non-ASCII must not be escaped differently
+        record = create_processed_data_record(**params)
+        assert serialize_record_to_jsonl(record) == record.model_dump_json(exclude_none=True)
+
     def test_format_for_llm_prompt_completion_basic(self, valid_record_params):
         record = create_processed_data_record(**valid_record_params)
         llm_data = format_for_llm_prompt_completion(record, include_html=True, include_image_path=False)
@@ -160,4 +191,17 @@ class TestDataFormatting:
         llm_data = format_for_llm_prompt_completion(record, include_html=True)
         assert "<DOM>HTML content not available</DOM>" in llm_data["text"]
 
+    def test_write_to_jsonl_multiple_batches(self, valid_record_params, tmp_path, monkeypatch):
+        # Force a flush every 2 lines so the batched write path is exercised across several batches
+        monkeypatch.setattr("src.dataset_builder.formatting._WRITE_BATCH_ITEMS", 2)
+        records = [
+            create_processed_data_record(**{**valid_record_params, "step_id": f"step_{i}"})
+            for i in range(5)
+        ]
+        output_file = tmp_path / "out" / "train.jsonl"
+        JsonlFormatter(ImageHandler()).write_to_jsonl(records, str(output_file))
+
+        lines = output_file.read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["step_id"] for line in lines] == [f"step_{i}" for i in range(5)]
+
 # Add more tests for various data cleaning, transformation, and normalization rules. 
\ No newline at end of file
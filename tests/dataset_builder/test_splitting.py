@@ -1,30 +1,51 @@
 '''
 Tests for dataset splitting utilities.
 '''
+import hashlib
 import pytest
+from itertools import chain
 from typing import List, Dict
 from src.dataset_builder.splitting import DataSplitter
 from src.dataset_builder.types import ProcessedDataRecord, ActionDetail # Adjust import as needed
 from src.dataset_builder.exceptions import DataSplittingError
 
+# Records here are built through pydantic's v2 API; a deprecated (v1-style) call should fail loudly, not warn per record.
+pytestmark = pytest.mark.filterwarnings("error::pydantic.warnings.PydanticDeprecationWarning")
+
 # Dummy ProcessedDataRecord for testing
+# Built without validation once; the splitter only shuffles and slices records, so copies of it are enough.
+_TEMPLATE_RECORD = ProcessedDataRecord.model_construct(
+    step_id="", session_id="", ts=0, url="http://example.com/", action=ActionDetail.model_construct(type="click"),
+)
+
 def create_dummy_record(record_id: int) -> ProcessedDataRecord:
-    return ProcessedDataRecord(
-        step_id=f"step_{record_id}",       # Corrected field name and made value more distinct
-        session_id=f"session_abc_{record_id // 10}",  # Corrected field name and made value more distinct
-        ts=1672531200 + record_id,
-        url=f"http://example.com/page{record_id}",
-        html_content=f"<html><body>Page {record_id}</body></html>",
-        action=ActionDetail(type="click", selector=f"//button[@id='btn{record_id}']"),
-        image_s3_path=f"s3://bucket/image{record_id}.webp"
-    )
-
-@pytest.fixture
+    return _TEMPLATE_RECORD.model_copy(update={
+        "step_id": f"step_{record_id}",
+        "session_id": f"session_abc_{record_id // 10}",
+        "ts": 1672531200 + record_id,
+        "url": f"http://example.com/page{record_id}",
+        "html_content": f"<html><body>Page {record_id}</body></html>",
+        "action": ActionDetail.model_construct(type="click", selector=f"//button[@id='btn{record_id}']"),
+    })
+
+@pytest.fixture(scope="session") # Tests only read the list; split_data shuffles its own copy
 def sample_records() -> List[ProcessedDataRecord]:
     return [create_dummy_record(i) for i in range(100)]
 
+@pytest.fixture(scope="session")
+def sample_record_ids(sample_records: List[ProcessedDataRecord]) -> frozenset:
+    return frozenset(r.step_id for r in sample_records)
+
+def _split_ids(splits: Dict[str, List[ProcessedDataRecord]]) -> frozenset:
+    """step_ids across all splits, collected in one pass."""
+    return frozenset(r.step_id for r in chain.from_iterable(splits.values()))
+
+def _split_digest(records: List[ProcessedDataRecord]) -> bytes:
+    """Digest of a split's step_id ordering, so two splits can be compared by one bytes equality."""
+    return hashlib.md5(b"|".join(r.step_id.encode() for r in records)).digest()
+
 class TestDataSplitter:
-    def test_split_data_default_ratios(self, sample_records: List[ProcessedDataRecord]):
+    def test_split_data_default_ratios(self, sample_records: List[ProcessedDataRecord], sample_record_ids: frozenset):
         splitter = DataSplitter(random_seed=42)
         splits = splitter.split_data(sample_records)
 
@@ -32,11 +53,7 @@ class TestDataSplitter:
         assert len(splits["validation"]) == 10
         assert len(splits["test"]) == 10
         # Check for no overlap and all records present
-        all_split_ids = set(r.step_id for r in splits["train"]) \
-                        | set(r.step_id for r in splits["validation"]) \
-                        | set(r.step_id for r in splits["test"])
-        original_ids = set(r.step_id for r in sample_records)
-        assert all_split_ids == original_ids
+        assert _split_ids(splits) == sample_record_ids
 
     def test_split_data_custom_ratios(self, sample_records: List[ProcessedDataRecord]):
         splitter = DataSplitter(random_seed=123)
@@ -54,9 +71,8 @@ class TestDataSplitter:
         splitter2 = DataSplitter(random_seed=42)
         splits2 = splitter2.split_data(sample_records)
 
-        assert [r.step_id for r in splits1["train"]] == [r.step_id for r in splits2["train"]]
-        assert [r.step_id for r in splits1["validation"]] == [r.step_id for r in splits2["validation"]]
-        assert [r.step_id for r in splits1["test"]] == [r.step_id for r in splits2["test"]]
+        for split_name in ("train", "validation", "test"):
+            assert _split_digest(splits1[split_name]) == _split_digest(splits2[split_name]), split_name
 
     def test_split_data_no_seed(self, sample_records: List[ProcessedDataRecord]):
         # This test is statistical, might occasionally fail but should usually pass if shuffling is random
@@ -69,7 +85,8 @@ class TestDataSplitter:
         # Highly unlikely to be the same if shuffling is truly random without a seed
         # unless the dataset is very small or random number generator cycles quickly.
         # For a dataset of 100, this should almost always be different.
-        assert [r.step_id for r in splits1["train"]] != [r.step_id for r in splits2["train"]]
+        # Compare the step_id orderings only; tuple inequality stops at the first differing id.
+        assert tuple(r.step_id for r in splits1["train"]) != tuple(r.step_id for r in splits2["train"])
 
     def test_split_data_empty_list(self):
         splitter = DataSplitter()
@@ -96,11 +113,7 @@ class TestDataSplitter:
         assert len(splits["train"]) == 3
         assert len(splits["validation"]) == 1
         assert len(splits["test"]) == 1
-        all_split_ids = set(r.step_id for r in splits["train"]) \
-                        | set(r.step_id for r in splits["validation"]) \
-                        | set(r.step_id for r in splits["test"])
-        original_ids = set(r.step_id for r in small_records)
-        assert all_split_ids == original_ids
+        assert _split_ids(splits) == {r.step_id for r in small_records}
 
     def test_split_data_ratios_leading_to_zero(self, sample_records: List[ProcessedDataRecord]):
         splitter = DataSplitter(random_seed=42)
@@ -1,14 +1,30 @@
 '''
 Tests for dataset statistics calculation.
 '''
+import logging
 import pytest
 from typing import List, Dict, Any
 from pydantic import HttpUrl
 
-from src.dataset_builder.statistics import DatasetStatistics
+from src.dataset_builder.statistics import DatasetStatistics, _extract_host
 from src.dataset_builder.types import ProcessedDataRecord, ActionDetail
 from src.dataset_builder.exceptions import DataStatisticsError
 
+# Records here are built through pydantic's v2 API; a deprecated (v1-style) call should fail loudly, not warn per record.
+pytestmark = pytest.mark.filterwarnings("error::pydantic.warnings.PydanticDeprecationWarning")
+
+# Built without validation once; create_test_record copies it instead of re-running the validators per record.
+_TEMPLATE_RECORD = ProcessedDataRecord.model_construct(
+    step_id="", session_id="", ts=1672531200, url="http://example.com/", action=ActionDetail.model_construct(type="click"),
+)
+
+# HttpUrl parses the full URL, so each distinct string is validated once and the instance shared between records.
+_URL_CACHE: Dict[str, HttpUrl] = {}
+
+def _url(url: str) -> HttpUrl:
+    cached = _URL_CACHE.get(url)
+    return cached if cached is not None else _URL_CACHE.setdefault(url, HttpUrl(url))
+
 # Helper to create dummy records easily
 def create_test_record(
     step_id: str,
@@ -17,17 +33,16 @@ def create_test_record(
     action_type: str,
     html_content: str | None = None
 ) -> ProcessedDataRecord:
-    return ProcessedDataRecord(
-        step_id=step_id,
-        session_id=session_id,
-        ts=1672531200,
-        url=HttpUrl(url), # Ensure HttpUrl for validation
-        action=ActionDetail(type=action_type),
-        html_content=html_content,
-        # obs_html_s3_path and screenshot_s3_path can be None by default
-    )
-
-@pytest.fixture
+    return _TEMPLATE_RECORD.model_copy(update={
+        "step_id": step_id,
+        "session_id": session_id,
+        "url": _url(url), # A real HttpUrl, as a validated record would hold
+        "action": ActionDetail.model_construct(type=action_type),
+        "html_content": html_content,
+        # obs_html_s3_path and screenshot_s3_path keep the template's None
+    })
+
+@pytest.fixture(scope="session") # Read-only: calculate_statistics never mutates its input
 def sample_records_for_stats() -> List[ProcessedDataRecord]:
     return [
         create_test_record("s1", "sessA", "http://example.com/page1", "click", "<html>click page</html>"),
@@ -72,47 +87,37 @@ class TestDatasetStatistics:
         }
         assert stats["domains_distribution"] == expected_domain_dist
 
-    def test_calculate_statistics_with_unparseable_url(self, capsys):
+    def test_calculate_statistics_with_unparseable_url(self, caplog):
         calculator = DatasetStatistics()
         records_with_bad_url = [
             create_test_record("s1", "sessA", "http://good.com", "click"),
-            # This record with an invalid URL will be problematic for urlparse
             ProcessedDataRecord(
                 step_id="s_bad_url", session_id="sess_bad", ts=123, 
-                # Pydantic HttpUrl will likely fail here, but if it somehow passes to urlparse later
-                # url="http://[::1]:namedport", # Example of a URL that might be valid for pydantic but tricky for urlparse in some contexts
                 url=HttpUrl("http://valid.but.problematic.for.some.parsers.com"), # Ensuring it's a valid HttpUrl for Pydantic
                 action=ActionDetail(type="bad_action"),
                 html_content="bad url content"
             ),
-            create_test_record("s3", "sessB", "http://good.net", "input")
+            create_test_record("s3", "sessB", "http://good.net", "input"),
+            # HttpUrl validation would reject this, but the unvalidated template lets it through to urlparse,
+            # which raises on the unterminated IPv6 host.
+            _TEMPLATE_RECORD.model_copy(update={"step_id": "s_unparseable", "session_id": "sessB", "url": "http://[::1"}),
         ]
-        # Forcing a URL that urlparse might struggle with if not handled correctly, though HttpUrl validation is strong.
-        # The more likely scenario is if str(record.url) gives something odd. Let's simulate that.
-        # We can't easily make HttpUrl invalid after creation without Pydantic error.
-        # The code already has a try-except for urlparse, so it should be robust.
-
-        # Let's test the warning print for an unparseable URL. 
-        # We can achieve this by temporarily giving a non-HttpUrl string to a record 
-        # and ensuring our class handles it by skipping for domain stats.
-        # This is tricky because ProcessedDataRecord enforces HttpUrl.
-        # The existing try-except in calculate_statistics handles general exceptions during urlparse(str(record.url)).
-        # So, we'll rely on that generic exception handling and ensure the stats are still mostly correct.
-
-        # Let's assume a record.url was somehow not a standard HttpUrl string due to prior data issues.
-        # This is hard to simulate correctly given Pydantic's HttpUrl validation.
-        # The current implementation prints a warning and continues.
-        # For now, we'll just verify the counts are correct for the valid URLs.
-        
-        # A simpler test: ensure it works if one URL is simply different.
-        stats = calculator.calculate_statistics(records_with_bad_url)
-        assert stats["total_records"] == 3
-        assert stats["unique_domains_count"] == 3 # good.com, valid...com, good.net
-        # The warning print for unparseable URLs is hard to assert directly without more complex mocking 
-        # if Pydantic's HttpUrl catches most truly malformed URLs. 
-        # The code's `print(f"Warning: Could not parse URL...")` is the main thing to be aware of.
-        # If the URL is truly unparseable by urlparse(str(record.url)), it will be skipped for domain stats.
-        # We assume Pydantic's HttpUrl ensures record.url is generally well-behaved for urlparse.
+
+        with caplog.at_level(logging.WARNING, logger="src.dataset_builder.statistics"):
+            stats = calculator.calculate_statistics(records_with_bad_url)
+        assert stats["total_records"] == 4
+        assert stats["unique_domains_count"] == 3 # good.com, valid...com, good.net; the unparseable URL is skipped
+        warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+        assert len(warnings) == 1
+        assert "Could not parse URL http://[::1 for record s_unparseable" in warnings[0].getMessage()
+
+    def test_calculate_statistics_populates_host_cache(self, sample_records_for_stats: List[ProcessedDataRecord]):
+        _extract_host.cache_clear()
+        DatasetStatistics().calculate_statistics(sample_records_for_stats)
+        cache_info = _extract_host.cache_info()
+        assert cache_info.currsize == len({str(r.url) for r in sample_records_for_stats})
+        assert _extract_host("http://example.com/page1") == "example.com"
+        assert _extract_host.cache_info().hits == cache_info.hits + 1 # Served from the cache
 
     # Add tests for HTML content statistics if/when that part is implemented
     # def test_html_content_statistics(self, sample_records_for_stats):
@@ -5,7 +5,9 @@ import gzip
 
 from src.html_processor import HTMLProcessor
 from src.html_processor.exceptions import MinificationError, DOMDiffError, HTMLProcessingError
-from src.html_processor.processor import MINIFY_HTML_AVAILABLE, BS4_AVAILABLE # Corrected import
+from src.html_processor.processor import MINIFY_HTML_AVAILABLE, BS4_AVAILABLE, LXML_AVAILABLE, SELECTOLAX_AVAILABLE, LEVENSHTEIN_AVAILABLE, ISAL_AVAILABLE # Corrected import
+from src.html_processor import processor as processor_module
+from src.html_processor.processor import _extract_text
 from unittest import mock
 
 @pytest.fixture
@@ -76,20 +78,47 @@ def test_gzip_compress_decompress(processor: HTMLProcessor):
     decompressed = gzip.decompress(compressed).decode('utf-8')
     assert decompressed == text
 
+@pytest.mark.parametrize("level", [1, 6, 9])
+def test_gzip_compress_is_standard_and_deterministic(processor: HTMLProcessor, level: int):
+    html = "<html><body>" + "<p>snapshot</p>" * 500 + "</body></html>"
+    compressed = processor.gzip_compress(html, compression_level=level)
+    assert compressed[:2] == b"\x1f\x8b" # gzip magic
+    assert gzip.decompress(compressed).decode('utf-8') == html
+    assert processor.gzip_compress(html, compression_level=level) == compressed
+
+@pytest.mark.parametrize("use_isal", [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(not ISAL_AVAILABLE, reason="python-isal not installed")),
+], ids=["zlib", "isal"])
+def test_gzip_compress_large_payload_round_trips(processor: HTMLProcessor, use_isal: bool):
+    html = ("<div class='row'><span>cell</span></div>" * 26000)[:1_000_000] # ~1 MB
+    with mock.patch('src.html_processor.processor.ISAL_AVAILABLE', use_isal):
+        compressed = processor.gzip_compress(html)
+    assert gzip.decompress(compressed).decode('utf-8') == html
+
 def test_gzip_compress_invalid_input(processor: HTMLProcessor):
     with pytest.raises(HTMLProcessingError, match="text_content must be a string"):
         processor.gzip_compress(12345) # type: ignore
 
 # --- Simplified DOM Diffing Tests ---
-@pytest.mark.skipif(not BS4_AVAILABLE, reason="BeautifulSoup4 not available")
-def test_is_significant_change_text_diff(processor: HTMLProcessor):
+@pytest.fixture(params=[
+    pytest.param("bs4", marks=pytest.mark.skipif(not BS4_AVAILABLE, reason="BeautifulSoup4 not available")),
+    pytest.param("selectolax", marks=pytest.mark.skipif(not SELECTOLAX_AVAILABLE, reason="selectolax not available")),
+])
+def text_backend(request):
+    """Runs a diffing test once per installed text-extraction backend."""
+    with mock.patch('src.html_processor.processor.SELECTOLAX_AVAILABLE', request.param == "selectolax"):
+        yield request.param
+
+def test_is_significant_change_text_diff(processor: HTMLProcessor, text_backend: str):
     html_old = "<p>Hello world</p>"
     html_new_small_change = "<p>Hello dear world</p>"
     html_new_big_change = "<p>Completely different content here now.</p>"
     html_new_same_text_diff_tags = "<div>Hello world</div>"
 
     assert processor.is_significant_change(html_old, html_new_big_change) is True
-    # 'dear ' is 5 chars. len_old=11, len_new=16. diff=5. max_len=16. 5/16 = 0.31 > 0.05 threshold
+    # 'dear ' inserts 5 chars into 11 (len_new=16). Levenshtein: 1 - ratio = indel 5 / (11 + 16) = 0.19;
+    # length delta fallback: 5 / max(11, 16) = 0.31. Both exceed the 0.05 threshold
     assert processor.is_significant_change(html_old, html_new_small_change, text_diff_threshold=0.05) is True 
     # Text content is the same, so no significant change by this metric
     assert processor.is_significant_change(html_old, html_new_same_text_diff_tags, text_diff_threshold=0.05) is False
@@ -98,8 +127,69 @@ def test_is_significant_change_text_diff(processor: HTMLProcessor):
     assert processor.is_significant_change("<p>Old text</p>", "<p> </p>") is True # Changed to effectively empty
     assert processor.is_significant_change("<p> </p>", "<p>  </p>") is False # Both effectively empty
 
+@pytest.mark.skipif(not (BS4_AVAILABLE and SELECTOLAX_AVAILABLE), reason="BeautifulSoup4 and selectolax both needed")
+@pytest.mark.parametrize("html", [
+    "<p>Hello world</p>",
+    "<html><head><title>T</title><style>p{}</style><script>var a</script></head><body><p>Hi  there</p></body></html>",
+    "<div> <span>One</span>\n  <span></span><span>Two</span> </div>",
+    "",
+])
+def test_extract_text_selectolax_matches_bs4(html: str):
+    with mock.patch('src.html_processor.processor.SELECTOLAX_AVAILABLE', True):
+        selectolax_text = _extract_text(html)
+    with mock.patch('src.html_processor.processor.SELECTOLAX_AVAILABLE', False):
+        assert _extract_text(html) == selectolax_text
+
+@pytest.mark.skipif(not (BS4_AVAILABLE and LXML_AVAILABLE), reason="BeautifulSoup4 with lxml not available")
+@pytest.mark.parametrize("html_old, html_new", [
+    ("<p>Hello world</p>", "<p>Hello dear world</p>"),
+    ("<p>Hello world</p>", "<div>Hello world</div>"),
+    ("<p></p>", "<p>New text</p>"),
+    ("<p> </p>", "<p>  </p>"),
+    ("<html><body><ul><li>One<li>Two</ul></body></html>", "<ul><li>One</li><li>Two</li></ul>"),
+])
+def test_is_significant_change_lxml_matches_html_parser(processor: HTMLProcessor, html_old: str, html_new: str):
+    # Both runs go through BeautifulSoup; only the parser differs
+    with mock.patch('src.html_processor.processor.SELECTOLAX_AVAILABLE', False):
+        lxml_result = processor.is_significant_change(html_old, html_new)
+        with mock.patch('src.html_processor.processor.BS4_PARSER', 'html.parser'):
+            assert processor.is_significant_change(html_old, html_new) is lxml_result
+
+@pytest.mark.skipif(not (BS4_AVAILABLE and LEVENSHTEIN_AVAILABLE), reason="BeautifulSoup4 and Levenshtein needed")
+def test_is_significant_change_counts_same_length_substitutions(processor: HTMLProcessor):
+    html_old, html_new = "<p>Hello world</p>", "<p>Jello wurld</p>" # Same text length, 2 of 11 chars changed
+    assert processor.is_significant_change(html_old, html_new, text_diff_threshold=0.05) is True
+    assert processor.is_significant_change(html_old, html_new, text_diff_threshold=0.5) is False
+    with mock.patch('src.html_processor.processor.LEVENSHTEIN_AVAILABLE', False):
+        assert processor.is_significant_change(html_old, html_new, text_diff_threshold=0.05) is False # Length delta is 0
+
+@pytest.mark.skipif(not (BS4_AVAILABLE and LEVENSHTEIN_AVAILABLE), reason="BeautifulSoup4 and Levenshtein needed")
+def test_is_significant_change_pure_insertion_is_half_as_sensitive(processor: HTMLProcessor):
+    # Intended trade-off: an insertion of k chars scores k / (len_old + len_new) with Levenshtein,
+    # about half the old k / max(len_old, len_new). Appending 8% of the text no longer crosses 0.05.
+    html_old, html_new = "<p>" + "x" * 100 + "</p>", "<p>" + "x" * 100 + "y" * 8 + "</p>"
+    assert processor.is_significant_change(html_old, html_new, text_diff_threshold=0.05) is False # 8 / 208 = 0.038
+    with mock.patch('src.html_processor.processor.LEVENSHTEIN_AVAILABLE', False):
+        assert processor.is_significant_change(html_old, html_new, text_diff_threshold=0.05) is True # 8 / 108 = 0.074
+
+def test_is_significant_change_reuses_previous_snapshot_text(processor: HTMLProcessor, text_backend: str):
+    processor_module._text_cache.clear()
+    html_old = "<p>Previous snapshot</p>"
+    with mock.patch.object(processor_module, "_extract_text", wraps=processor_module._extract_text) as extract:
+        for i in range(100):
+            processor.is_significant_change(html_old, f"<p>Snapshot {i}</p>")
+    # html_old is parsed once; each new snapshot once
+    assert extract.call_count == 100 + 1
+
+def test_is_significant_change_skips_parsing_identical_html(processor: HTMLProcessor, text_backend: str):
+    html = "<html><body>" + "<p>shared</p>" * 6000 + "</body></html>"
+    with mock.patch.object(processor_module, "_extract_text", wraps=processor_module._extract_text) as extract:
+        assert processor.is_significant_change(html, html) is False
+        assert extract.call_count == 0
+
 def test_is_significant_change_bs4_unavailable(processor: HTMLProcessor):
-    with mock.patch('src.html_processor.processor.BS4_AVAILABLE', False):
+    with mock.patch('src.html_processor.processor.BS4_AVAILABLE', False), \
+            mock.patch('src.html_processor.processor.SELECTOLAX_AVAILABLE', False):
         with pytest.raises(DOMDiffError, match="BeautifulSoup4 not available"):
             processor.is_significant_change("<a></a>", "<b></b>")
 
@@ -116,4 +206,26 @@ def test_cap_length_invalid_input(processor: HTMLProcessor, caplog):
     assert "cap_length received non-string input" in caplog.text
     caplog.clear()
     processor.cap_length("test", max_chars=-5) # Invalid max_chars
-    assert "Invalid max_chars (-5) for cap_length" in caplog.text 
\ No newline at end of file
+    assert "Invalid max_chars (-5) for cap_length" in caplog.text 
+
+def test_cap_length_bytes(processor: HTMLProcessor):
+    data = b"a" * 1_000_000
+    capped = processor.cap_length_bytes(data, max_bytes=30000)
+    assert capped == b"a" * 30000
+    short = b"<p>short</p>"
+    assert processor.cap_length_bytes(short, max_bytes=100) is short # No copy when under the cap
+    assert processor.cap_length_bytes(data, max_bytes=0) == b""
+
+def test_cap_length_bytes_keeps_utf8_characters_whole(processor: HTMLProcessor):
+    data = ("é" * 10).encode("utf-8") # 2 bytes per character
+    capped = processor.cap_length_bytes(data, max_bytes=5)
+    assert capped == ("é" * 2).encode("utf-8")
+    assert capped.decode("utf-8") == "éé"
+    emoji = ("a" + "\U0001F600" * 3).encode("utf-8") # 1 + 3 * 4 bytes
+    assert processor.cap_length_bytes(emoji, max_bytes=7).decode("utf-8") == "a\U0001F600"
+
+def test_cap_length_bytes_invalid_input(processor: HTMLProcessor, caplog):
+    with pytest.raises(HTMLProcessingError, match="data must be bytes"):
+        processor.cap_length_bytes("text") # type: ignore
+    processor.cap_length_bytes(b"test", max_bytes=-1)
+    assert "Invalid max_bytes (-1) for cap_length_bytes" in caplog.text
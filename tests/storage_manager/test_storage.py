@@ -6,10 +6,11 @@ from pathlib import Path
 from typing import Dict, List
 import boto3
 
-from src.storage_manager.storage import StorageManager, HTML_FILENAME, SCREENSHOT_FILENAME, ACTION_FILENAME, METADATA_FILENAME
+from src.storage_manager.storage import StorageManager, HTML_FILENAME, SCREENSHOT_FILENAME, ACTION_DATA_FILENAME as ACTION_FILENAME, METADATA_FILENAME, S3_UPLOAD_MAX_ATTEMPTS, S3_CLIENT_CONFIG
 from src.storage_manager.exceptions import S3ConfigError, S3OperationError, LocalStorageError, StorageManagerError
 from src.storage_manager import config as sm_config
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
+from tenacity import wait_none
 
 # Store original env vars to restore them after tests that modify them
 ORIGINAL_ENV = os.environ.copy()
@@ -128,7 +129,7 @@ class TestStorageManagerInitialization:
             assert sm.s3_bucket_name == test_bucket
             assert sm.s3_region_name == test_region
             assert sm._s3_client is mock_s3_client_instance
-            mock_boto_client_constructor.assert_called_once_with("s3", region_name=test_region)
+            mock_boto_client_constructor.assert_called_once_with("s3", region_name=test_region, config=S3_CLIENT_CONFIG)
             info = sm.get_storage_info()
             assert info["effective_storage_type"] == "S3"
 
@@ -333,6 +334,49 @@ class TestStorageManagerUploadOperations:
         with pytest.raises(S3OperationError, match="S3 upload failed"):
             sm._upload_to_s3(b"data", "key")
 
+    @pytest.mark.asyncio
+    async def test_s3_client_created_once_and_reused(self, tmp_path):
+        with patch('boto3.client', return_value=MagicMock()) as mock_boto_client_constructor:
+            sm = StorageManager(s3_bucket_name="reuse-bucket", local_base_path=str(tmp_path), prefer_s3=True)
+            for i in range(5):
+                await sm._upload_to_s3(b"data", f"key{i}")
+        mock_boto_client_constructor.assert_called_once()
+        assert sm._get_s3_client().put_object.call_count == 5
+
+    def test_s3_client_config_leaves_retries_to_tenacity(self, aws_credentials):
+        # botocore retries stacked under the tenacity wrapper would multiply PUTs per failing object
+        client = boto3.client("s3", region_name="us-east-1", config=S3_CLIENT_CONFIG)
+        assert client.meta.config.retries == {"mode": "adaptive", "total_max_attempts": 1}
+
+    @pytest.fixture
+    def no_retry_wait(self, monkeypatch):
+        """Removes the exponential backoff between _upload_to_s3 retries so the tests run instantly."""
+        monkeypatch.setattr(StorageManager._upload_to_s3.retry, "wait", wait_none())
+
+    @pytest.mark.asyncio
+    async def test_upload_retries_and_succeeds_on_second_attempt(self, mock_s3_sm, no_retry_wait):
+        sm, mock_client = mock_s3_sm
+        mock_client.put_object.side_effect = [ClientError({"Error": {"Code": "SlowDown"}}, "put_object"), {}]
+        url = await sm._upload_to_s3(b"data", "key")
+        assert url == f"s3://{sm.s3_bucket_name}/key"
+        assert mock_client.put_object.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_upload_transient_error_exhausts_retries(self, mock_s3_sm, no_retry_wait):
+        sm, mock_client = mock_s3_sm
+        mock_client.put_object.side_effect = ClientError({"Error": {"Code": "503"}}, "put_object")
+        with pytest.raises(S3OperationError, match="S3 upload failed"):
+            await sm._upload_to_s3(b"data", "key")
+        assert mock_client.put_object.call_count == S3_UPLOAD_MAX_ATTEMPTS
+
+    @pytest.mark.asyncio
+    async def test_upload_non_transient_error_not_retried(self, mock_s3_sm, no_retry_wait):
+        sm, mock_client = mock_s3_sm
+        mock_client.put_object.side_effect = ClientError({"Error": {"Code": "AccessDenied"}}, "put_object")
+        with pytest.raises(S3OperationError):
+            await sm._upload_to_s3(b"data", "key")
+        assert mock_client.put_object.call_count == 1
+
     def test_write_to_local_success_bytes(self, local_sm):
         sm, base_path = local_sm
         local_file_path = base_path / "local_obj.bin"